@@ -33,8 +33,13 @@ _basic::
 
 a_io::
 
-  arr_json, dict_arrays, dict_struct, excel_np, iterable_dict, load_npy,
-  load_txt, save_npy, save_txt, struct_dict
+  arr_json, dict_arrays, dict_struct, excel_np, iter_txt, iterable_dict,
+  load_npy, load_txt, npy_append, npy_memmap, openxl_np, save_npy,
+  save_txt, struct_dict, txt_dtype
+
+colstore::
+
+  Table, save_table
 
 create::
 
@@ -58,23 +63,33 @@ geom::
 
 grid::
 
-   combine_, expand_zone, fill_arr, reclass_ranges, reclass_vals, scale_up
+   aggregate, combine_, expand_zone, fill_arr, reclass_ranges, reclass_vals,
+   scale_up, zonal_stats
 
 image::
 
-  _even_odd, _pad_even_odd, _pad_nan, _pad_zero, a_filter, equalize,
-  normalize, plot_img, rgb_gray
+  _even_odd, _pad_even_odd, _pad_nan, _pad_zero, a_filter, convolve,
+  equalize, normalize, plot_img, rgb_gray
 
 ndset::
 
   _view_as_, _check_dtype_, nd_diff, nd_diffxor, nd_intersect, nd_isin,
   nd_union, nd_uniq
 
+overviews::
+
+  Overviews, build_overviews
+
 py_tools::
 
   _flatten, combine_dicts, comp_info, dir_py, flatten_shape, folders,
   get_dir, pack, sub_folders, unpack
 
+sindex::
+
+  PointIndex, poly_extents, seg_extents, str_tree, tree_nearest, tree_query,
+  tree_query_boxes, tree_query_pnts
+
 stackstats::
 
   check_shapes, check_stack, mask_stack, stack_cumprod, stack_cumsum,
@@ -83,7 +98,7 @@ stackstats::
 
 tbl::
 
-  find_in, tbl_count, tbl_replace, tbl_sum
+  find_in, group_by, tbl_count, tbl_replace, tbl_sum
 
 tblstats::
 
@@ -92,10 +107,10 @@ tblstats::
 tools::
 
   _func, _tools_help_, arr2xyz, arrays_struct, block, block_arr, change_arr,
-  concat_arrs, find, group_pnts, group_vals, is_in, make_blocks, make_flds,
-  nd2rec, nd2struct, nd_rec, nd_struct, pack_last_axis, pad_, radial_sort,
-  rc_vals, reclass, rolling_stats, running_count, scale, sequences,
-  sliding_window_view, sort_cols_by_row, sort_rows_by_col, view_sort,
+  concat_arrs, find, focal_stats, group_pnts, group_vals, is_in, make_blocks,
+  make_flds, nd2rec, nd2struct, nd_rec, nd_struct, pack_last_axis, pad_,
+  radial_sort, rc_vals, reclass, rolling_stats, running_count, scale,
+  sequences, sliding_window_view, sort_cols_by_row, sort_rows_by_col, view_sort,
   split_array, stride, uniq, xy_vals
 
 utils::
@@ -111,12 +126,13 @@ utils::
 
 
 
-from . import (_basic, _io, create, frmts, geom, geom_common, geom_properties,
-               grid, image, ndset, py_tools, saws, stackstats, surface,
-               tbl, tblstats, tools, utils)
+from . import (_basic, _io, colstore, create, frmts, geom, geom_common,
+               geom_properties, grid, image, ndset, overviews, py_tools, saws,
+               sindex, stackstats, surface, tbl, tblstats, tools, utils)
 
 from ._basic import *
-from ._io import load_npy, save_npy, load_txt, save_txt
+from ._io import (load_npy, save_npy, npy_append, npy_memmap, iter_txt,
+                  load_txt, save_txt, txt_dtype)
 from .create import *
 from .frmts import prn
 from .geom import *
@@ -126,7 +142,8 @@ from .grid import *
 from .ndset import *
 from .saws import *
 from .stackstats import *
-from .tbl import find_a_in_b, find_in, _split_sort_slice_, tbl_count, tbl_sum
+from .tbl import (find_a_in_b, find_in, _split_sort_slice_, group_by,
+                  tbl_count, tbl_sum)
 from .tools import *
 from .utils import dirr
 
@@ -137,6 +154,7 @@ __art_all__ = ['__art_version__']
 __art_dict__ = {
         '_basic': _basic.__all__,
         '_io': _io.__all__,
+        'colstore': colstore.__all__,
         'create': create.__all__,
         'frmts': frmts.__all__,
         'geom': geom.__all__,
@@ -145,8 +163,10 @@ __art_dict__ = {
         'grid': grid.__all__,
         'image': image.__all__,
         'ndset': ndset.__all__,
+        'overviews': overviews.__all__,
         'py_tools': py_tools.__all__,
         'saws': saws.__all__,
+        'sindex': sindex.__all__,
         'stackstats': stackstats.__all__,
         'tbl': tbl.__all__,
         'tblstats': tblstats.__all__,
@@ -7,7 +7,7 @@ Script :   _io.py
 
 Author :   Dan.Patterson@carleton.ca
 
-Modified : 2019-01-06
+Modified : 2019-02-26
 
 Purpose : Basic io tools for numpy arrays
 
@@ -15,12 +15,15 @@ Notes::
 
     0.  dtype_info  - returns names, formats for structured arrays
     1.  load_npy    - load numpy npy files
-    2.  save_npy    - save array to .npy format
-    3.  load_txt    - read array created by save_txtt
-    4.  save_txt    - save array to npy format
+    2.  save_npy    - save array to .npy format, npy_append adds rows in
+                      place and npy_memmap maps a range of rows
+    3.  load_txt    - read delimited text, block by block, see also
+                      txt_dtype and iter_txt
+    4.  save_txt    - save array to text, block by block
     5.  arr_json    - save to json format
     6-9 dict<->array conversions
-    10. excel_np    - convert xls/xlsx files to numpy structured/recarray
+    10. excel_np    - convert xls/xlsx files to numpy structured/recarray,
+                      openxl_np with openpyxl
 
 
 """
@@ -31,7 +34,10 @@ Notes::
 
 # ---- imports, formats, constants ----
 import sys
+import os
+import struct
 import numpy as np
+from arraytools._basic import del_punc_space
 
 
 ft = {'bool': lambda x: repr(x.astype(np.int32)),
@@ -45,6 +51,10 @@ script = sys.argv[0]  # print this should you need to locate the script
 __all__ = ['dtype_info',
            'load_npy',
            'save_npy',
+           'npy_append',
+           'npy_memmap',
+           'txt_dtype',
+           'iter_txt',
            'load_txt',
            'save_txt',
            'arr_json',
@@ -52,7 +62,8 @@ __all__ = ['dtype_info',
            'iterable_dict',
            'dict_struct',
            'struct_dict',
-           'excel_np'
+           'excel_np',
+           'openxl_np'
            ]
 
 
@@ -84,12 +95,13 @@ def dtype_info(a=None, as_string=False):
 
 # ----------------------------------------------------------------------
 # (1) load_npy .... code section ---
-def load_npy(f_name, all_info=False):
+def load_npy(f_name, all_info=False, mmap_mode=None):
     """load a well formed `npy` file representing a structured array
 
-    Returns an array, the description, field names and their size.
+    Returns an array, the description, field names and their size.  Use
+    `mmap_mode` ('r', 'r+', 'c') to open the file as a memory map.
     """
-    a = np.load(f_name)
+    a = np.load(f_name, mmap_mode=mmap_mode)
     if all_info:
         desc = a.dtype.descr
         nms = a.dtype.names
@@ -100,68 +112,451 @@ def load_npy(f_name, all_info=False):
 
 # ----------------------------------------------------------------------
 # (2) read_npy .... code section ---
-def save_npy(a, f_name):
+def save_npy(a, f_name, appendable=False):
     """Save an array as an npy file.
 
     The type of data in each column is arbitrary.  It will be cast to the
-    given dtype at runtime
+    given dtype at runtime.  `appendable=True` reserves header space so
+    `npy_append` can add rows in place.
     """
-    np.save(f_name, a)
+    if appendable:
+        if os.path.isfile(f_name):
+            os.remove(f_name)
+        npy_append(f_name, a)
+    else:
+        np.save(f_name, a)
+
+
+# ----------------------------------------------------------------------
+# (2a) appendable npy .... code section ---
+def _npy_header_(f):
+    """Read the header of an open `.npy` file.
+
+    Returns the version, dtype, shape, fortran order and the data offset.
+    """
+    f.seek(0)
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran, dt = np.lib.format.read_array_header_1_0(f)
+    elif version == (2, 0):
+        shape, fortran, dt = np.lib.format.read_array_header_2_0(f)
+    else:
+        raise ValueError("npy version {} not supported".format(version))
+    return version, dt, shape, fortran, f.tell()
+
+
+def _npy_header_bytes_(dt, shape, fortran=False, size=None):
+    """Return the bytes of a `.npy` header, magic string included.
+
+    `size`, the data offset of an existing file, pads the header to that
+    length so it can be rewritten in place.  None reserves room for a 20
+    digit row count, rounded up to 64 bytes as np.save does.
+    """
+    def _dict_(shp):
+        d = {'descr': np.lib.format.dtype_to_descr(dt),
+             'fortran_order': fortran, 'shape': tuple(shp)}
+        return repr(d).encode('latin1')
+    h = _dict_(shape)
+    if size is None:
+        n = len(_dict_((10**19,) + tuple(shape[1:]))) + 1
+        pre = 10 if n + 10 < 2**16 else 12
+        size = -(-(pre + n) // 64) * 64
+    pre = 10 if size - 10 < 2**16 else 12
+    if pre + len(h) + 1 > size:
+        return None
+    h += b' ' * (size - pre - len(h) - 1) + b'\n'
+    if pre == 10:
+        magic = np.lib.format.magic(1, 0) + struct.pack('<H', size - pre)
+    else:
+        magic = np.lib.format.magic(2, 0) + struct.pack('<I', size - pre)
+    return magic + h
+
+
+def _npy_set_rows_(name, rows):
+    """Rewrite the row count in the header of a `.npy` file, in place.
+    Returns False if the header has no room for it.
+    """
+    with open(name, 'r+b') as f:
+        _, dt, shape, fortran, offset = _npy_header_(f)
+        h = _npy_header_bytes_(dt, (rows,) + shape[1:], fortran, offset)
+        if h is None:
+            return False
+        f.seek(0)
+        f.write(h)
+    return True
+
+
+def npy_append(name, records):
+    """Append `records` to the `.npy` file `name`, creating it if needed.
+
+    Parameters
+    ----------
+    name : text
+        The file name.  A new file gets a reserved header and the dtype
+        and row shape of `records`, so pass an array to create one.
+    records : array or list of tuples
+        Rows of the file's dtype, a structured array with the same field
+        names, or anything np.asarray converts to the dtype.  For an nD file
+        the rows have its shape after the first axis.
+
+    Returns
+    -------
+    The number of rows in the file.
+
+    Notes
+    -----
+    The rows are written after the last row and the row count in the header
+    is then rewritten, so an append costs the new rows only and the file is
+    still read by `np.load`.  If the write fails the file keeps its old row
+    count.  A file from `np.save` may have no room for a larger count, it is
+    copied once to a reserved header.
+
+    >>> for day in feeds:
+    ...     n = npy_append("c:/temp/obs.npy", load_txt(day))
+    >>> a = npy_memmap("c:/temp/obs.npy", start=n - 1000)  # the last 1000
+    """
+    if not os.path.isfile(name):
+        a = np.asanyarray(records)
+        if a.ndim == 0:
+            a = a.reshape(1)
+        with open(name, 'wb') as f:
+            f.write(_npy_header_bytes_(a.dtype, (0,) + a.shape[1:]))
+    with open(name, 'rb') as f:
+        _, dt, shape, fortran, offset = _npy_header_(f)
+    if fortran and len(shape) > 1:
+        raise ValueError("Fortran ordered files can not be appended to")
+    a = records
+    if not isinstance(a, np.ndarray) or a.dtype != dt:
+        if isinstance(a, np.ndarray) and a.dtype.names != dt.names:
+            msg = "Fields {} differ from the file's {}"
+            raise ValueError(msg.format(a.dtype.names, dt.names))
+        a = np.asarray(a, dtype=dt)
+    a = a.reshape((-1,) + shape[1:])
+    rows = shape[0] + len(a)
+    if _npy_header_bytes_(dt, (rows,) + shape[1:], fortran, offset) is None:
+        _npy_reserve_(name)
+        return npy_append(name, a)
+    row_bytes = dt.itemsize * int(np.prod(shape[1:], dtype=np.int64))
+    with open(name, 'r+b') as f:
+        f.seek(offset + shape[0] * row_bytes)
+        f.write(np.ascontiguousarray(a).tobytes())
+        f.truncate()
+    _npy_set_rows_(name, rows)
+    return rows
+
+
+def _npy_reserve_(name, rows=None, chunk=2**24):
+    """Copy a `.npy` file to one with a reserved header, `chunk` bytes at a
+    time, and replace it.  `rows` sets the row count of the new header.
+    """
+    with open(name, 'rb') as f:
+        _, dt, shape, fortran, offset = _npy_header_(f)
+        rows = shape[0] if rows is None else rows
+        tmp = name + ".tmp"
+        with open(tmp, 'wb') as out:
+            out.write(_npy_header_bytes_(dt, (rows,) + shape[1:], fortran))
+            f.seek(offset)
+            buf = f.read(chunk)
+            while buf:
+                out.write(buf)
+                buf = f.read(chunk)
+    os.replace(tmp, name)
+
+
+def npy_memmap(name, start=0, stop=None, fields=None, mode='r'):
+    """Return rows `start` to `stop` of a `.npy` file as an np.memmap.
+
+    Parameters
+    ----------
+    start, stop : integer
+        The rows to map, clipped to the file.  Only these pages are read.
+    fields : text or list
+        Field(s) of a structured file, returned as a view of the map.
+    mode : text
+        'r', 'r+' or 'c', as np.memmap.  'r+' writes go to the file.
+    """
+    with open(name, 'rb') as f:
+        _, dt, shape, fortran, offset = _npy_header_(f)
+    if fortran and len(shape) > 1:
+        raise ValueError("Fortran ordered file, use np.load")
+    N = shape[0]
+    stop = N if stop is None else min(max(stop, 0), N)
+    start = min(max(start, 0), stop)
+    tail = tuple(shape[1:])
+    row_bytes = dt.itemsize * int(np.prod(tail, dtype=np.int64))
+    if stop == start or row_bytes == 0:
+        m = np.empty((stop - start,) + tail, dtype=dt)
+    else:
+        m = np.memmap(name, dtype=dt, mode=mode, shape=(stop - start,) + tail,
+                      offset=offset + start * row_bytes)
+    if fields is None:
+        return m
+    return m[fields if isinstance(fields, str) else list(fields)]
 
 
 # ----------------------------------------------------------------------
 # (3) read_txt .... code section ---
-def load_txt(name="arr.txt", data_type=None):
-    """Read the structured/recarray created by save_txt.
+def _split_line_(line, sep):
+    """Split a text line into stripped fields"""
+    return [i.strip() for i in line.rstrip('\r\n').split(sep)]
+
+
+def _infer_dtype_(rows, names):
+    """Structured dtype for the sample `rows`, a list of field lists.
+
+    A column is `<i4` (or `<i8` if it needs it) when every value converts to
+    an integer, `<f8` when they convert to floats, otherwise text as wide as
+    the widest sample value.  Empty values are skipped, so a column of
+    numbers with blanks is numeric and the blanks become nodata.
+    """
+    dt = []
+    for j, name in enumerate(names):
+        col = np.array([r[j] if j < len(r) else '' for r in rows], dtype='U')
+        vals = col[col != ''] if col.size else col
+        kind = '<f8'
+        if vals.size:
+            try:
+                i = vals.astype(np.int64)
+                big = (i.min() < np.iinfo(np.int32).min or
+                       i.max() > np.iinfo(np.int32).max)
+                kind = '<i8' if big else '<i4'
+            except (ValueError, OverflowError):
+                try:
+                    vals.astype(np.float64)
+                except ValueError:
+                    kind = '<U{}'.format(max(np.char.str_len(vals).max(), 1))
+        dt.append((name, kind))
+    return np.dtype(dt)
+
+
+def txt_dtype(name="arr.txt", sep=",", names=True, sample=1000):
+    """Return the structured dtype of a delimited text file, inferred from
+    the first `sample` data lines.
+
+    Parameters
+    ----------
+    sep : text
+        The field separator, a comma by default.
+    names : boolean or list
+        True, the first line has the field names, which are cleaned with
+        `_basic.del_punc_space`.  False, they are `f0, f1 ...`.  A list, the
+        names to use, the file having no header line.
+
+    Returns
+    -------
+    dtype, and the number of header lines to skip, 0 or 1.
+    """
+    from itertools import islice
+    with open(name, 'r') as f:
+        lines = [i for i in islice(f, sample + 1) if i.strip()]
+    skip = 1 if names is True else 0
+    rows = [_split_line_(i, sep) for i in lines]
+    if names is True:
+        hdr = [del_punc_space(i) for i in rows[0]]
+        rows = rows[1:]
+    elif names is False or names is None:
+        hdr = ['f{}'.format(i) for i in range(max(len(i) for i in rows))]
+    else:
+        hdr = list(names)
+    return _infer_dtype_(rows, hdr), skip
+
+
+def _parse_block_(lines, dt, sep, int_null=-999):
+    """Parse a list of text lines to a structured array of dtype `dt`.
+
+    `np.loadtxt` parses the block, text fields as objects so they can be
+    stripped before they are cut to their width.  If it fails,
+    usually on blank numeric fields, the block is split in python and blank
+    floats become nan, blank integers `int_null`.  Values that don't fit
+    `dt`, ie. one past the sampled rows overflowing an inferred '<i4',
+    raise a ValueError.
+    """
+    txt = [i for i in dt.names if dt[i].kind in 'US']
+    dt_o = [(i, 'O' if i in txt else dt[i]) for i in dt.names]
+    try:
+        b = np.loadtxt(lines, dtype=dt_o, delimiter=sep, comments=None,
+                       ndmin=1)
+    except (ValueError, OverflowError):
+        rows = [_split_line_(i, sep) for i in lines]
+        n = len(dt.names)
+        bad = [k for k, r in enumerate(rows) if len(r) != n]
+        if bad:
+            msg = "{} fields expected, line {} of the block has {}"
+            raise ValueError(msg.format(n, bad[0], len(rows[bad[0]])))
+        a = np.empty(len(rows), dtype=dt)
+        for j, fld in enumerate(dt.names):
+            col = np.array([r[j] for r in rows], dtype='U')
+            kind = dt[fld].kind
+            if kind == 'f':
+                col = np.where(col == '', 'nan', col)
+            elif kind in 'iu':
+                col = np.where(col == '', str(int_null), col)
+            try:
+                a[fld] = col
+            except (ValueError, OverflowError) as e:
+                msg = "field {} doesn't fit {} ({}), widen `sample` or " \
+                      "pass `data_type`"
+                raise ValueError(msg.format(fld, dt[fld], e)) from None
+        return a
+    if not txt:
+        return b.astype(dt)
+    a = np.empty(len(b), dtype=dt)
+    for fld in dt.names:
+        if fld in txt:
+            a[fld] = np.char.strip(b[fld].astype('U'))
+        else:
+            a[fld] = b[fld]
+    return a
+
+
+def _count_lines_(name, size=2**24):
+    """Count the lines in a file, reading it in binary blocks"""
+    n = 0
+    last = b'\n'
+    with open(name, 'rb') as f:
+        buf = f.read(size)
+        while buf:
+            n += buf.count(b'\n')
+            last = buf[-1:]
+            buf = f.read(size)
+    return n + (last != b'\n')
+
+
+def iter_txt(name="arr.txt", data_type=None, sep=",", names=True,
+             sample=1000, chunk=2**16, int_null=-999):
+    """Read a delimited text file as a generator of structured arrays of
+    `chunk` rows, the last one shorter.
+
+    Parameters
+    ----------
+    data_type : dtype
+        None, to infer it with `txt_dtype` from the first `sample` lines.
+    names : boolean or list
+        See `txt_dtype`.  With a `data_type` and names=True the header line
+        is skipped and the dtype names are used.
+    chunk : integer
+        Rows per block.  Only one block of text and its array are in memory.
+    int_null : integer
+        The value for blank integer fields.  Blank floats are nan.
+
+    Examples
+    --------
+    >>> for b in iter_txt("c:/temp/pnts.csv", chunk=10**6):
+    ...     totals += np.bincount(b['Zone'], b['Z'], minlength=10)
+    """
+    from itertools import islice
+    if data_type is None:
+        dt, skip = txt_dtype(name, sep=sep, names=names, sample=sample)
+    else:
+        dt, skip = np.dtype(data_type), int(names is True)
+    with open(name, 'r') as f:
+        for _ in range(skip):
+            next(f, None)
+        while True:
+            lines = [i for i in islice(f, chunk) if i.strip()]
+            if not lines:
+                break
+            yield _parse_block_(lines, dt, sep, int_null)
+
+
+def load_txt(name="arr.txt", data_type=None, sep=",", names=True,
+             sample=1000, chunk=2**16, out=None, int_null=-999):
+    """Read the structured/recarray created by save_txt, or any delimited
+    text file, block by block.
 
     Parameters
     ----------
-    dtype : data type
-        If `None`, it allows the structure to be read from the array.
-    delimiter : string
+    data_type : data type
+        If `None`, the dtype is inferred from the first `sample` lines, see
+        `txt_dtype`.
+    sep : string
         Use a comma delimiter by default.
-    skip_header : int
-        Number of rows to skip at the beginning
-    names : boolean
+    names : boolean or list
         If `True`, the first row contains the field names.
-    encoding :
-        Set to None to use system default
-    see np.genfromtxt for all `args` and `kwargs`.
+    chunk : integer
+        Rows parsed at a time, see `iter_txt`.
+    out : None, array or text
+        None, a new array is returned.  An array, of the dtype and with
+        enough rows, is filled and the part filled returned.  A `*.npy`
+        file name, the blocks are written to it and it is returned as a
+        read only memory map, so the file can be much larger than memory.
 
+    Notes
+    -----
+    The lines are counted first, a fast binary pass, so the result is made
+    once at its final size.  Blank lines are skipped.  Text fields wider
+    than the sample's widest are truncated, pass a `data_type` if that
+    matters.
     """
-    a = np.genfromtxt(name, dtype=data_type,
-                      delimiter=",",
-                      names=True,
-                      autostrip=True,
-                      encoding=None)  # ,skip_header=1)
-    return a
+    if data_type is None:
+        dt, skip = txt_dtype(name, sep=sep, names=names, sample=sample)
+    else:
+        dt, skip = np.dtype(data_type), int(names is True)
+    is_npy = isinstance(out, str)
+    if out is None or is_npy:
+        N = max(_count_lines_(name) - skip, 0)
+        if is_npy:
+            res = np.lib.format.open_memmap(out, mode='w+', dtype=dt,
+                                            shape=(N,))
+        else:
+            res = np.empty((N,), dtype=dt)
+    else:
+        res = out
+    n = 0
+    for b in iter_txt(name, dt, sep=sep, names=bool(skip), chunk=chunk,
+                      int_null=int_null):
+        if n + len(b) > len(res):
+            raise ValueError("`out` has {} rows, too few".format(len(res)))
+        res[n:n + len(b)] = b
+        n += len(b)
+    if is_npy:
+        res.flush()
+        del res
+        if n != N:
+            _npy_set_rows_(out, n)
+        return np.load(out, mmap_mode='r')
+    return res[:n]
 
 
 # ----------------------------------------------------------------------
 # (4) save_txt .... code section ---
-def save_txt(a, name="arr.txt", sep=", ", dt_hdr=True):
-    """Save a NumPy structured, recarray to text.
+def save_txt(a, name="arr.txt", sep=", ", dt_hdr=True, chunk=2**16,
+             aligned=True):
+    """Save a NumPy structured, recarray to text, `chunk` rows at a time.
 
     Parameters
     ----------
     a : array
-        input array
+        input array, which can be a memmap larger than memory
     fname : filename
         output filename and path otherwise save to script folder
     sep : separator
         column separater, include a space if needed
     dt_hdr : boolean
         if True, add dtype names to the header of the file
-
+    chunk : integer
+        Rows formatted and written at a time, through a buffered file.
+    aligned : boolean
+        True, columns are padded to their widest value, which takes a first
+        pass over the blocks to find the widths.  False, one pass.
     """
-    a_names = ", ".join(i for i in a.dtype.names)
-    hdr = ["", a_names][dt_hdr]  # use "" or names from input array
-    s = np.array(a.tolist(), dtype=np.unicode_)
-    widths = [max([len(i) for i in s[:, j]])
-              for j in range(s.shape[1])]
-    frmt = sep.join(["%{}s".format(i) for i in widths])
-    # vals = ", ".join([i[1] for i in a.dtype.descr])
-    np.savetxt(name, a, fmt=frmt, header=hdr, comments="")
+    names = a.dtype.names
+    hdr = ["", sep.join(names)][dt_hdr]  # use "" or names from input array
+    if aligned:
+        widths = [0] * len(names)
+        for i in range(0, len(a), chunk):
+            b = a[i:i + chunk]
+            widths = [max(w, int(np.char.str_len(b[f].astype('U')).max()))
+                      for w, f in zip(widths, names)]
+        frmt = sep.join(["%{}s".format(i) for i in widths])
+    else:
+        frmt = sep.join(["%s"] * len(names))
+    with open(name, 'w', buffering=2**20) as f:
+        if hdr:
+            f.write(hdr + "\n")
+        for i in range(0, len(a), chunk):
+            rows = a[i:i + chunk].tolist()
+            f.write("\n".join([frmt % r for r in rows]) + "\n")
     print("\nFile saved...")
 
 
@@ -302,7 +697,106 @@ def struct_dict(a):
 
 # ----------------------------------------------------------------------
 # (10) excel_np
-def excel_np(path, sheet_num=0, int_null=-999):
+def _xl_column_(vals, int_null=-999, nodata=None):
+    """Decode a column of cell values to an array in one pass.
+
+    Parameters
+    ----------
+    vals : list
+        Cell values, floats, text, '' (xlrd) or None (openpyxl) for blanks.
+    int_null : integer
+        The null for a float column whose values are all integers, which
+        is returned as int64.
+    nodata : list
+        Other values to treat as blank, eg. ['NA', 'n/a', -9999].
+
+    Returns
+    -------
+    A float, int or text array, converted by numpy a column at a time
+    rather than cell by cell.  Floats have nan for blanks, text columns
+    are stripped of spaces, including the non-breaking ones, and blanks are
+    'None'.  A column with any text, other than nodata, is text.
+    """
+    nodata = [] if nodata is None else list(nodata)
+    ar = None
+    if not [v for v in nodata if isinstance(v, str)]:
+        try:
+            ar = np.array(vals, dtype=np.float64)  # numbers, None is nan
+            if nodata:
+                ar[np.isin(ar, nodata)] = np.nan
+        except (ValueError, TypeError):
+            ar = None
+    if ar is None:
+        o = np.empty(len(vals), dtype=object)
+        o[:] = vals
+        blank = np.equal(o, None) | np.equal(o, '')
+        for v in nodata:
+            blank |= np.equal(o, v)
+        ar = np.full(o.shape, np.nan)
+        try:
+            ar[~blank] = o[~blank].astype(np.float64)
+        except (ValueError, TypeError):
+            s = np.char.strip(o.astype('U'), ' \t\r\n\xa0\u200b')
+            blank |= (s == '')
+            try:
+                ar[~blank] = s[~blank].astype(np.float64)
+            except ValueError:
+                return np.where(blank, 'None', s)
+    is_nan = np.isnan(ar)
+    vals = ar[~is_nan]
+    if vals.size and np.all(np.equal(vals, np.round(vals))):
+        ar[is_nan] = int_null
+        return ar.astype(np.int64)
+    return ar
+
+
+def _xl_table_(names, columns):
+    """Assemble decoded columns as a structured array.  The names are
+    stripped and cleaned with `_basic.del_punc_space`, blank names are
+    `f0, f1 ...`.
+    """
+    names = [str(i).strip() if i is not None else '' for i in names]
+    names = [del_punc_space(i) if i else 'f{}'.format(j)
+             for j, i in enumerate(names)]
+    arr = np.empty((len(columns[0]) if columns else 0,),
+                   dtype=list(zip(names, [c.dtype.str for c in columns])))
+    for n, c in zip(names, columns):
+        arr[n] = c
+    return arr
+
+
+def _xl_cols_(names, cols):
+    """Column numbers of `cols`, numbers or header names, all if None."""
+    if cols is None:
+        return list(range(len(names)))
+    hdr = [str(i).strip() if i is not None else '' for i in names]
+    return [c if isinstance(c, (int, np.integer)) else hdr.index(c)
+            for c in cols]
+
+
+def _xl_cache_(path, reader, args, cache):
+    """Return the array of `reader(path, *args)` from a `.npy` cache, made
+    if missing or stale.  The cache file is named from the arguments, and
+    is valid while its modified time equals the workbook's.
+    """
+    if not cache:
+        return reader(path, *args)
+    import hashlib
+    folder = os.path.dirname(path) if cache is True else cache
+    key = hashlib.md5(repr((reader.__name__,) + args).encode()).hexdigest()
+    name = os.path.join(folder, "{}.{}.npy".format(os.path.basename(path),
+                                                   key[:10]))
+    mt = os.stat(path).st_mtime_ns
+    if os.path.isfile(name) and os.stat(name).st_mtime_ns == mt:
+        return np.load(name)
+    arr = reader(path, *args)
+    np.save(name, arr)
+    os.utime(name, ns=(mt, mt))
+    return arr
+
+
+def excel_np(path, sheet_num=0, int_null=-999, cols=None, rows=None,
+             nodata=None, cache=False):
     """Read excel files to numpy structured/record arrays.  Your spreadsheet
     must adhere to simple rules::
 
@@ -315,7 +809,8 @@ def excel_np(path, sheet_num=0, int_null=-999):
     Parameters
     ----------
     path : text
-        Full path to the xls, xlsx file
+        Full path to the xls, xlsx file.  xlrd 2 and later only read xls,
+        use `openxl_np` for xlsx files.
     sheet_num : integer
         Sheets are numbered from 0.
     int_null : integer
@@ -323,20 +818,26 @@ def excel_np(path, sheet_num=0, int_null=-999):
         but integers have no equivalent so you have to provide one.
         you could use np.iinfo(np.intXX).min where XX is 8, 16, 32 to reflect
         the appropriate integer minimums
+    cols : list
+        Column numbers or header names to read, all if None.
+    rows : tuple
+        (start, stop) data rows to read, the header not counted.
+    nodata : list
+        Cell values, text or numbers, to treat as blank.
+    cache : boolean or text
+        True, keep the result as a `.npy` next to the workbook, or in the
+        folder given, and load it while the workbook is unchanged.
 
     Returns
     -------
     A numpy structured array is returned.  Excel only uses float or string
-    data, so attempts are made to coerse integer columns by comparing the
-    float vs int versions of the arrays.  A tad of a kludge, but it works.
-
-    The first row's data type is compared to its matching column data type.
-    If they match, then it is used as the dtype.  If there is a mismatch an
-    attempt is made to recover numeric data by assigning blanks etc in numeric
-    columns a value of np.nan.
+    data, so float columns whose values are all integers are returned as
+    int64, with `int_null` for blanks.
 
-    String/text columns are check for empty cells, '', "" and that ever so
-    ugly invisible space.
+    Each column is decoded as a whole by `_xl_column_`.  A column of numbers
+    and blanks is converted in one step with nan for the blanks.  A column
+    with text is stripped of spaces, including that ever so ugly invisible
+    one, and its empty cells are 'None'.
 
     Notes
     -----
@@ -354,93 +855,61 @@ def excel_np(path, sheet_num=0, int_null=-999):
     ----------
     `<https://media.readthedocs.org/pdf/xlrd/latest/xlrd.pdf>`_.
     """
-    def _values(sheet, rows, cols):
-        """return cell types for the above.  Skip the first row
-        Not used .... just kept for future reference
-        """
-        ar = []
-        for i in range(1, rows):
-            c = []
-            for j in range(cols):
-                c.append(sheet.cell_values(i, j))  # sheet.cell_types also
-            ar.append(c)
-        return ar
-
-    def isfloat(a):
-        """float check"""
-        try:
-            i = float(a)
-            return i
-        except ValueError:
-            return np.nan
+    args = (sheet_num, int_null, cols, rows, nodata)
+    return _xl_cache_(path, _excel_np_, args, cache)
 
-    def punc_space(name):
-        """delete punctuation and spaces and replace with '_'"""
-        punc = list('!"#$%&\'()*+,-./:;<=>?@[\\]^`{|}~ ')
-        return "".join([[i, '_'][i in punc] for i in name])
 
+def _excel_np_(path, sheet_num, int_null, cols, rows, nodata):
+    """`excel_np` without the cache"""
     import xlrd
-    w = xlrd.open_workbook(path)        # xlrd.book.Book class
-    sheet = w.sheet_by_index(sheet_num) # sheet by number
-    # sheet = w.sheet_by_name('test')   # case sensitive, not implemented
-    names = sheet.row_values(0)         # clean these up later
-    cols = sheet.ncols
-    rows = sheet.nrows
-    col_data = [sheet.col_values(i, 1, rows) for i in range(cols)]
-    row_guess = sheet.row_values(1)
-    row_dts = [np.asarray(i).dtype.kind for i in row_guess]
-    col_dts = [np.asarray(col_data[i]).dtype.kind
-               for i in range(cols)]
-    clean = []
-    N = len(row_dts)
-    for i in range(N):
-        c = col_data[i]
-        if row_dts[i] == col_dts[i]:    # same dtype... send to array
-            ar = np.asarray(c)
-        if row_dts[i] == 'f':           # float? if so, substitute np.nan
-            ar = np.array([isfloat(i) for i in c])
-            is_nan = np.isnan(ar)       # find the nan values, then check
-            not_nan = ar[~is_nan]       # are the floats == ints?
-            if np.all(np.equal(not_nan, not_nan.astype('int'))):  # integer?
-                ar[is_nan] = int_null   # assign the integer null
-                ar = ar.astype('int')
-        elif row_dts[i] in ('U', 'S'):  # unicode/string... send to array
-            ar = np.char.strip(ar)
-            ar = np.where(np.char.str_len(ar) == 0, 'None', ar)
-        else:
-            ar = np.asarray(c)
-        clean.append(ar)
-    # ---- assemble the columns for the array ----
-    dt_str = [i.dtype.str for i in clean]
-    names = [i.strip() for i in names]      # clean up leading/trailing spaces
-    names = [punc_space(i) for i in names]  # replace punctuation and spaces
-    dts_name = list(zip(names, dt_str))
-    arr = np.empty((rows-1,), dtype=dts_name)
-    cnt = 0
-    for i in names:
-        arr[i] = clean[cnt]
-        cnt += 1
-    return arr
-
-
-def openxl_np(path):
-    """read excel using openpyxl
-    A = np.array([[i.value for i in j] for j in ws['C1':'E38']])
+    w = xlrd.open_workbook(path, on_demand=True)  # xlrd.book.Book class
+    sheet = w.sheet_by_index(sheet_num)
+    names = sheet.row_values(0)
+    r0, r1 = (0, None) if rows is None else rows
+    r1 = sheet.nrows if r1 is None else min(r1 + 1, sheet.nrows)
+    idx = _xl_cols_(names, cols)
+    columns = [_xl_column_(sheet.col_values(i, r0 + 1, r1), int_null,
+                           nodata) for i in idx]
+    w.release_resources()
+    return _xl_table_([names[i] for i in idx], columns)
+
+
+def openxl_np(path, sheet_num=0, int_null=-999, cols=None, rows=None,
+              nodata=None, cache=False):
+    """Read excel using openpyxl, in read only mode, to a structured array.
+    The parameters and result are those of `excel_np`.
+
+    The rows are streamed as values and turned into columns with zip, then
+    decoded a column at a time by `_xl_column_`.
 
     `<https://stackoverflow.com/questions/35823835/reading-excel-file-is-
     magnitudes-slower-using-openpyxl-compared-to-xlrd>`_.
-
-    cols = sheet.max_column  # sheet.min_column  1 to max
-    rows = sheet.max_row  # sheet.min_row
     """
+    args = (sheet_num, int_null, cols, rows, nodata)
+    return _xl_cache_(path, _openxl_np_, args, cache)
+
+
+def _openxl_np_(path, sheet_num, int_null, cols, rows, nodata):
+    """`openxl_np` without the cache"""
     import openpyxl as op
-    wb = op.load_workbook(path, data_only=True, guess_types=True,
+    wb = op.load_workbook(path, read_only=True, data_only=True,
                           keep_links=False)
-    sheets = wb.sheetnames
-    sheet = wb[sheets[0]]
-    data = list(sheet.values)
-    #header = data[0]
-    return data
+    sheet = wb[wb.sheetnames[sheet_num]]
+    names = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True))
+    idx = _xl_cols_(names, cols)
+    r0, r1 = (0, None) if rows is None else rows
+    r1 = None if r1 is None else r1 + 1
+    c0, c1 = min(idx) + 1, max(idx) + 1
+    data = sheet.iter_rows(min_row=r0 + 2, max_row=r1, min_col=c0,
+                           max_col=c1, values_only=True)
+    columns = list(zip(*data))
+    wb.close()
+    if not columns:
+        columns = [()] * (c1 - c0 + 1)
+    columns = [_xl_column_(columns[i - c0 + 1], int_null, nodata)
+               for i in idx]
+    return _xl_table_([names[i] for i in idx], columns)
+
 
 def _demo_npy():
     """
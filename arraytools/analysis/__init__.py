@@ -1,7 +1,7 @@
 from .arr_moving import block, stride_, rolling_stats
 from .compass_angles import compass
 from .line_ang_azim import line_dir
-from .near import not_closer, n_near
+from .near import not_closer, n_near, knn_chunks, n_near_chunked
 from .vincenty import vincenty
 __all__ = ['block',
            'stride_',
@@ -10,4 +10,6 @@ __all__ = ['block',
            'line_dir',
            'not_closer',
 	       'n_near',
+           'knn_chunks',
+           'n_near_chunked',
 	       'vincenty']
@@ -0,0 +1,430 @@
+# -*- coding: UTF-8 -*-
+"""
+colstore
+========
+
+Script:   colstore.py
+
+Author:   Dan.Patterson@carleton.ca
+
+Modified: 2019-02-24
+
+Purpose:  columnar storage of structured arrays, one .npy per field
+
+Requires:
+---------
+    arraytools._io - npy_append, npy_memmap
+    arraytools.tools - _func, the conditions of `find`
+
+Notes:
+------
+A structured array is read and written by rows, so two fields of a sixty
+field table cost all sixty.  `save_table` writes each field to its own
+`.npy` file in a folder, with a json manifest of the dtypes, the row count
+and the min and max of each field.  `Table` opens the folder and memory
+maps a column only when it is asked for.
+
+The manifest also has a zone map per field for each `chunk` rows, the
+min, max and null count, so `Table.where` reads only the chunks that can
+hold a match.
+
+>>> t = save_table(a, folder)       # or an iterable of arrays, iter_txt
+>>> t = Table(folder)               # later on
+>>> t['Age']                        # a column, memory mapped
+>>> t[['Town', 'Age']]              # a structured array of 2 fields
+>>> t[1000:2000]                    # rows, all fields
+>>> t.append(b)                     # more rows, added to each column
+>>> t.where('ID', 'btwn', (5000, 6000))  # reads 1 or 2 chunks
+
+A `Table` has a structured `dtype`, a length and returns columns by name,
+so `tblstats.col_stats`, `tbl.tbl_sum`, `tbl.group_by` and
+`tools.split_array` take one in place of an array and only read the fields
+they use.
+
+References:
+-----------
+
+`<https://arrow.apache.org/docs/format/Columnar.html>`_.
+
+"""
+# pylint: disable=C0103
+# pylint: disable=R1710
+# pylint: disable=R0914
+
+# ---- imports, formats, constants ----
+import sys
+import os
+import json
+from itertools import chain
+import numpy as np
+from arraytools._basic import del_punc_space
+from arraytools._io import npy_append, npy_memmap
+from arraytools.tools import _func
+
+ft = {'bool': lambda x: repr(x.astype(np.int32)),
+      'float_kind': '{: 0.3f}'.format}
+np.set_printoptions(edgeitems=5, linewidth=100, precision=2, suppress=True,
+                    threshold=150, formatter=ft)
+
+script = sys.argv[0]  # print this should you need to locate the script
+
+__all__ = ['Table', 'save_table']
+
+manifest_name = "table.json"
+
+
+def _json_val_(v):
+    """A numpy scalar as a json value.  nan is None, dates and text are
+    strings."""
+    if v is None:
+        return None
+    v = np.asarray(v)
+    if v.dtype.kind in 'MmUS':
+        return str(v.astype('U'))
+    v = v.item()
+    if isinstance(v, float) and v != v:
+        return None
+    return v
+
+
+def _min_max_(c):
+    """Min and max of a column, nan skipped, None if it has no values."""
+    c = np.asarray(c).ravel()
+    if c.dtype.kind == 'f':
+        c = c[~np.isnan(c)]
+    if c.size == 0 or c.dtype.kind in 'OV':
+        return None, None
+    if c.dtype.kind in 'US':
+        s = np.sort(c)
+        return s[0], s[-1]
+    return c.min(), c.max()
+
+
+def _nulls_(c):
+    """The null count of a column block: nan, NaT or empty text."""
+    kind = c.dtype.kind
+    if kind in 'fc':
+        return int(np.isnan(c).sum())
+    if kind in 'Mm':
+        return int(np.isnat(c).sum())
+    if kind in 'US':
+        return int((c == c.dtype.type()).sum())
+    return 0
+
+
+def _merge_(lo0, hi0, lo, hi):
+    """Merge the min and max json values of two blocks."""
+    if lo is None:
+        return lo0, hi0
+    if lo0 is None:
+        return lo, hi
+    return min(lo0, lo), max(hi0, hi)
+
+
+def _zones_(fld, c, start, chunk):
+    """Add the zone maps, min, max and null count per `chunk` rows, of the
+    column block `c` to the field entry `fld`.  `c` starts at row `start`
+    of the table, so a partly filled last chunk is merged with it.
+    """
+    z = fld.setdefault('zones', {'min': [], 'max': [], 'nulls': []})
+    i, n = 0, len(c)
+    while i < n:
+        k = (start + i) // chunk
+        j = min(n, (k + 1) * chunk - start)
+        lo, hi = [_json_val_(v) for v in _min_max_(c[i:j])]
+        nul = _nulls_(c[i:j])
+        if k < len(z['min']):
+            z['min'][k], z['max'][k] = _merge_(z['min'][k], z['max'][k],
+                                               lo, hi)
+            z['nulls'][k] += nul
+        else:
+            z['min'].append(lo)
+            z['max'].append(hi)
+            z['nulls'].append(nul)
+        i = j
+
+
+def _zone_keep_(z, dt, op, this):
+    """Boolean, per chunk, False where the zone map `z` shows that no row
+    can meet `op` with `this`.  The ops are those of `tools.find`.
+    """
+    n = len(z['min'])
+    ok = np.array([v is not None for v in z['min']], dtype=bool)
+    lo = np.zeros(n, dtype=dt)
+    hi = np.zeros(n, dtype=dt)
+    lo[ok] = [v for v in z['min'] if v is not None]
+    hi[ok] = [v for v in z['max'] if v is not None]
+    full = ok & (np.asarray(z['nulls']) == 0)
+    op = op.lower().strip()
+    if op in ('eq', 'e', '=='):
+        keep = np.zeros(n, dtype=bool)
+        for v in np.atleast_1d(this):
+            keep |= (lo <= v) & (hi >= v)
+        return keep & ok
+    if op in ('neq', 'ne', '!='):
+        vals = np.atleast_1d(this)
+        same = full & (lo == hi) & np.isin(lo, vals)
+        return ~same
+    if op in ('ls', 'les', '<'):
+        return ok & (lo < this)
+    if op in ('lseq', 'lese', '<='):
+        return ok & (lo <= this)
+    if op in ('gt', 'grt', '>'):
+        return ok & (hi > this)
+    if op in ('gteq', 'gte', '>='):
+        return ok & (hi >= this)
+    if op in ('btwn', 'btw', '>a<'):
+        low, upp = this
+        return ok & (hi >= low) & (lo < upp)
+    if op in ('btwni', 'btwi', '=>a<='):
+        low, upp = this
+        return ok & (hi >= low) & (lo <= upp)
+    if op in ('byond', 'bey', '<a>'):
+        low, upp = this
+        return ok & ((lo < low) | (hi > upp))
+    raise ValueError("op {} not supported".format(op))
+
+
+class Table(object):
+    """A table stored by `save_table`, one memory mapped `.npy` per field.
+
+    Parameters
+    ----------
+    path : text
+        Folder containing `table.json` and the column files.
+
+    Notes
+    -----
+    `t[name]` is a column, a read only np.memmap opened on first use.
+    `t[names]`, a list of names, `t[rows]`, an integer, slice, index or
+    boolean array, and `t.read(names, rows)` return structured arrays,
+    reading only those fields and rows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, manifest_name)) as f:
+            self.manifest = json.load(f)
+        self.fields = {fld['name']: fld for fld in self.manifest['fields']}
+        self.names = tuple(fld['name'] for fld in self.manifest['fields'])
+        self.dtype = np.dtype([(fld['name'], fld['dtype'],
+                                tuple(fld['shape']))
+                               for fld in self.manifest['fields']])
+        self._cols = {}
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    @property
+    def shape(self):
+        """The number of rows, as the shape of a structured array."""
+        return (len(self),)
+
+    def __repr__(self):
+        frmt = "Table: {:,} rows, {} fields\n  path: {}\n  dtype: {}"
+        return frmt.format(len(self), len(self.names), self.path, self.dtype)
+
+    def _file_(self, name):
+        return os.path.join(self.path, self.fields[name]['file'])
+
+    def column(self, name):
+        """The column `name`, memory mapped."""
+        if name not in self.fields:
+            raise KeyError("No field {} in {}".format(name, self.names))
+        if name not in self._cols:
+            self._cols[name] = npy_memmap(self._file_(name))
+        return self._cols[name]
+
+    def read(self, names=None, rows=None):
+        """Return a structured array of the fields `names`, all if None,
+        for `rows`, all if None, else a slice, integer or boolean index.
+        """
+        names = self.names if names is None else names
+        names = [names] if isinstance(names, str) else list(names)
+        if isinstance(rows, (int, np.integer)):
+            rows = slice(rows, rows + 1 if rows != -1 else None)
+        elif rows is not None and not isinstance(rows, slice):
+            rows = np.asarray(rows)
+            if rows.dtype.kind == 'b':
+                rows = np.flatnonzero(rows)
+        cols = []
+        for n in names:
+            if isinstance(rows, slice):
+                r0, r1, step = rows.indices(len(self))
+                c = npy_memmap(self._file_(n), r0, r1) if step == 1 else \
+                    self.column(n)[rows]
+            elif rows is None:
+                c = self.column(n)
+            else:
+                c = self.column(n)[rows]
+            cols.append(c)
+        out = np.empty(len(cols[0]) if cols else 0, dtype=self.dtype[names])
+        for n, c in zip(names, cols):
+            out[n] = c
+        return out
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.column(key)
+        if isinstance(key, (list, tuple)) and key and \
+                all(isinstance(k, str) for k in key):
+            return self.read(key)
+        return self.read(None, key)
+
+    def __array__(self, dtype=None, copy=None):
+        a = self.read()
+        return a if dtype is None else a.astype(dtype)
+
+    def where(self, col, op, value, names=None, rows=False):
+        """Return the records where `col` `op` `value` is True.
+
+        Parameters
+        ----------
+        col : text
+            The field queried, one value per row.
+        op : text
+            As `tools.find`, `eq, neq, ls, lseq, gt, gteq, btwn, btwni,
+            byond` or `==, !=, <, <=, >, >=, >a<, =>a<=, <a>`.  eq and neq
+            take one value or a list, the btwn ops a (low, upper) pair.
+        names : text or list
+            The fields returned, all if None.
+        rows : boolean
+            True, return the row numbers rather than the records.
+
+        Notes
+        -----
+        Chunks whose zone map (min, max, null count) shows that no row can
+        match are skipped, the rest are read in runs of adjacent chunks and
+        filtered with `tools._func`.  A range on a sorted time or ID column
+        reads little more than the matching rows.  Text queries such as
+        those of `tbl.find_in` can be run on the result.
+
+        >>> t.where('Date', 'btwni', (d0, d1), names=['Date', 'Obs'])
+        """
+        fld = self.fields[col]
+        if fld['shape']:
+            raise ValueError("{} has {} values per row".format(col,
+                                                                fld['shape']))
+        dt = np.dtype(fld['dtype'])
+        this = np.asarray(value, dtype=dt if dt.kind in 'MmUS' else None)
+        N = len(self)
+        z = fld.get('zones')
+        chunk = self.manifest.get('chunk')
+        if z is None or not chunk:
+            keep, chunk = np.ones(1, dtype=bool), max(N, 1)
+        else:
+            keep = _zone_keep_(z, dt, op, this)
+        c = self.column(col)
+        idx = [np.zeros(0, dtype=np.intp)]
+        k = np.flatnonzero(keep)
+        if k.size:
+            cuts = np.flatnonzero(np.diff(k) > 1) + 1
+            for run in np.split(k, cuts):
+                r0, r1 = run[0] * chunk, min((run[-1] + 1) * chunk, N)
+                idx.append(_func(op, np.asarray(c[r0:r1]), this) + r0)
+        idx = np.concatenate(idx)
+        if rows:
+            return idx
+        return self.read(names, idx)
+
+    def chunks_read(self, col, op, value):
+        """The fraction of the chunks of `col` that `where` would read."""
+        z = self.fields[col].get('zones')
+        if z is None or not z['min']:
+            return 1.0
+        dt = np.dtype(self.fields[col]['dtype'])
+        this = np.asarray(value, dtype=dt if dt.kind in 'MmUS' else None)
+        return float(_zone_keep_(z, dt, op, this).mean())
+
+    def append(self, records):
+        """Append `records`, a structured array with the table's fields, to
+        each column and update the manifest.  Returns the row count.
+        """
+        records = np.asarray(records)
+        missing = [n for n in self.names if n not in (records.dtype.names
+                                                       or ())]
+        if missing:
+            raise ValueError("Fields missing: {}".format(missing))
+        self._cols = {}
+        _append_(self.path, self.manifest, records)
+        return len(self)
+
+
+def _append_(path, manifest, a, write=True):
+    """Append the structured array `a` to the columns of `manifest` and,
+    if `write`, rewrite it.  Each column is written in place by
+    `npy_append` and its min, max and zone maps are updated.
+    """
+    chunk = manifest.get('chunk')
+    for fld in manifest['fields']:
+        c = np.asarray(a[fld['name']]).astype(fld['dtype'])
+        npy_append(os.path.join(path, fld['file']), c)
+        lo, hi = [_json_val_(v) for v in _min_max_(c)]
+        fld['min'], fld['max'] = _merge_(fld['min'], fld['max'], lo, hi)
+        if chunk:
+            _zones_(fld, c, manifest['rows'], chunk)
+    manifest['rows'] += len(a)
+    if write:
+        with open(os.path.join(path, manifest_name), 'w') as f:
+            json.dump(manifest, f)
+
+
+def save_table(a, path, chunk=2**16):
+    """Save a structured array, by column, to the folder `path`.
+
+    Parameters
+    ----------
+    a : array or iterable
+        A structured array, np.memmap or `Table`, or an iterable of
+        structured arrays of one dtype, such as `_io.iter_txt`.
+    path : text
+        The folder, created if needed.  Files of an earlier table in it
+        are replaced.
+    chunk : integer
+        Rows per zone map.  Smaller chunks skip more precisely, at the
+        cost of a larger manifest.  Arrays are written a multiple of
+        `chunk` rows, about 2**20, at a time.
+
+    Returns
+    -------
+    The `Table` of `path`.
+    """
+    if isinstance(a, (np.ndarray, Table)):
+        step = chunk * max(1, 2**20 // chunk)
+        blocks = (a[i:i + step] for i in range(0, len(a), step))
+        dt = a.dtype
+    else:
+        blocks = iter(a)
+        first = next(blocks)
+        dt = first.dtype
+        blocks = chain([first], blocks)
+    if dt.names is None:
+        raise ValueError("A structured array is required")
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    fields = []
+    for i, n in enumerate(dt.names):
+        f = "c{:03d}_{}.npy".format(i, del_punc_space(n))
+        if os.path.isfile(os.path.join(path, f)):
+            os.remove(os.path.join(path, f))
+        base = dt[n].base
+        npy_append(os.path.join(path, f),
+                   np.empty((0,) + dt[n].shape, dtype=base))
+        fields.append({'name': n, 'dtype': base.str,
+                       'shape': list(dt[n].shape), 'file': f,
+                       'min': None, 'max': None})
+    manifest = {'rows': 0, 'chunk': chunk, 'fields': fields}
+    for b in blocks:
+        _append_(path, manifest, b, write=False)
+    _append_(path, manifest, np.empty(0, dtype=dt))
+    return Table(path)
+
+
+# ----------------------------------------------------------------------
+# __main__ .... code section
+if __name__ == "__main__":
+    """Optionally...
+    : - print the script source name.
+    : - run the _demo
+    """
+#    print("Script... {}".format(script))
@@ -32,7 +32,8 @@ Included in this module::
     '_demo', 'densify_by_factor', '_new_view_', '_test', 'adjacency_edge', 'affine_',
     'angles_poly', 'as_strided', 'cartesian', 'cartesian_dist', 'center_',
     'close_arr', 'cross', 'dedent', 'densify', 'dist_bearing_sort', 'e_2d',
-    'e_area', 'e_dist', 'e_leng', 'ft', 'intersect_pnt', 'intersects', 'knn',
+    'e_area', 'e_dist', 'e_leng', 'ft', 'intersect_pairs', 'intersect_pnt',
+    'intersects', 'knn',
     'nn_kdtree', 'np', 'p_o_p', 'pnt_', 'pnt_in_list', 'pnt_on_poly',
     'pnt_on_seg', 'point_in_polygon', 'poly2segments', 'radial_sort',
     'remove_self', 'rotate', 'script', 'simplify', 'stride', 'sys',
@@ -115,6 +116,7 @@ script = sys.argv[0]  # print this should you need to locate the script
 __all__ = ['close_arr', 'stride',
            'poly2segments', 
            'intersect_pnt', 'intersects',     # intersection
+           'intersect_pairs',
            'cartesian_dist',
            'densify_by_factor', '_convert',   # densify simplify
            'densify', 'simplify',
@@ -316,6 +318,52 @@ def intersects(*args):
     return (True, (x, y))
 
 
+def intersect_pairs(a, b, tree=None):
+    """Segment intersection for two collections of segments at once.
+
+    Parameters
+    ----------
+    a, b : arrays
+        (N, 2, 2) and (M, 2, 2) arrays of from-to segments.  See
+        `poly2segments`.
+    tree : array
+        Optional spatial index of the `b` segments, produced by
+        ``sindex.str_tree(sindex.seg_extents(b))``.  Only the pairs whose
+        extents overlap are tested.  Without it, all N*M pairs are tested.
+
+    Returns
+    -------
+    The indices into `a` and `b` of the intersecting pairs and an (K, 2) array
+    of the intersection points.
+
+    Notes
+    -----
+    The checks in `intersects` are applied to all the pairs.  As there,
+    parallel and collinear segments do not intersect and neither do segments
+    that only meet at one of their end points.
+    """
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 2, 2)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 2, 2)
+    if tree is None:
+        i, j = np.indices((len(a), len(b))).reshape(2, -1)
+    else:
+        from arraytools.sindex import seg_extents, tree_query_boxes
+        i, j = tree_query_boxes(tree, seg_extents(a))
+    p0, p1, p2, p3 = a[i, 0], a[i, 1], b[j, 0], b[j, 1]
+    d10 = p1 - p0
+    d32 = p3 - p2
+    d02 = p0 - p2
+    denom = d10[:, 0] * d32[:, 1] - d32[:, 0] * d10[:, 1]
+    s_numer = d10[:, 0] * d02[:, 1] - d10[:, 1] * d02[:, 0]
+    t_numer = d32[:, 0] * d02[:, 1] - d32[:, 1] * d02[:, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = s_numer / denom
+        t = t_numer / denom
+    keep = (denom != 0) & (s > 0) & (s < 1) & (t > 0) & (t < 1)
+    xy = p0[keep] + t[keep, None] * d10[keep]
+    return i[keep], j[keep], xy
+
+
 def cartesian_dist(a, b):
     """Form the cartesian product of two 2D arrays.
 
@@ -832,14 +880,16 @@ def knn(p, pnts, k=1, return_dist=True):
     ----------
     p : array
         x,y reference point
-    pnts : array
-        Points array to examine
+    pnts : array or index
+        Points array to examine, or a `sindex.PointIndex` (or cKDTree) built
+        once for them, which avoids the distance to every point.
     k : integer
         The `k` in k-nearest neighbours
 
     Returns
     -------
     Array of k-nearest points and optionally their distance from the source.
+    Points equal to `p` are excluded.
     """
     def _remove_self_(p, pnts):
         """Remove a point which is duplicated or itself from the array
@@ -854,6 +904,21 @@ def knn(p, pnts, k=1, return_dist=True):
         return np.sqrt(np.einsum('ij,ij->i', diff, diff))
     #
     p = np.asarray(p)
+    if hasattr(pnts, 'query'):  # PointIndex or cKDTree
+        n = len(pnts.data)
+        k = max(1, min(abs(int(k)), n))
+        kk = min(k + 1, n)
+        while True:  # widen the query if `p` is duplicated
+            d, idx = pnts.query(p, kk)
+            d, idx = np.atleast_1d(d), np.atleast_1d(idx)
+            keep = d > 0
+            if (keep.sum() >= k) or (kk == n):
+                break
+            kk = min(kk * 2, n)
+        xy = np.asarray(pnts.data)[idx[keep][:k]]
+        if return_dist:
+            return xy, d[keep][:k]
+        return xy
     k = max(1, min(abs(int(k)), len(pnts)))
     pnts = _remove_self_(p, pnts)
     d = _e_2d_(p, pnts)
@@ -869,8 +934,11 @@ def nn_kdtree(a, N=1, sorted_=True, to_tbl=True, as_cKD=True):
 
     Parameters
     ----------
-    a : array
+    a : array or index
         Assumed to be an array of point objects for which `nearest` is needed.
+        A `sindex.PointIndex` (or cKDTree) can be passed instead, so the tree
+        isn't rebuilt on every call.  Its points are used in their existing
+        order, `sorted_` and `as_cKD` are ignored.
     N : integer
         Number of neighbors to return.  Note: the point counts as 1, so N=3
         returns the closest 2 points, plus itself.
@@ -910,13 +978,18 @@ def nn_kdtree(a, N=1, sorted_=True, to_tbl=True, as_cKD=True):
     #
     from scipy.spatial import cKDTree, KDTree
     #
-    if sorted_:
-        a, _ = _xy_sort_(a)
-    # ---- query the tree for the N nearest neighbors and their distance
-    if as_cKD:
-        t = cKDTree(a)
+    if hasattr(a, 'query'):  # PointIndex or cKDTree, built already
+        t = a
+        a = np.asarray(a.data)
     else:
-        t = KDTree(a)
+        if sorted_:
+            a, _ = _xy_sort_(a)
+        # ---- build the tree
+        if as_cKD:
+            t = cKDTree(a)
+        else:
+            t = KDTree(a)
+    # ---- query the tree for the N nearest neighbors and their distance
     dists, indices = t.query(a, N+1)  # so that point isn't duplicated
     dists = dists[:, 1:]               # and the array is 2D
     frumXY = a[indices[:, 0]]
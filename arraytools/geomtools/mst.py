@@ -126,6 +126,15 @@ array([[ inf,  8.0,  5.0,  8.1,  10.0,  12.8],
 array([[3, 4], [ 0, 8], [7, 4], [10, 0], [10, 8], [0, 0]])
 >>> d[0][np.argsort(d[0])]  # => array([ 5.0, 8.0, 8.1, 10.0, 12.8, inf])
 
+(6) Euclidean tree
+
+>>> pairs, w = mst(a, method='delaunay', return_weights=True)
+>>> o_d = connect(a, w, pairs)
+
+The Delaunay triangulation contains the euclidean minimum spanning tree, so
+only its edges (about 3N) need to be reduced rather than the N*N distance
+matrix.  Use method='dense' for weights that aren't euclidean distances.
+
 : ---------------------------------------------------------------------:
 """
 # pylint: disable=C0103
@@ -178,7 +187,7 @@ def _e_dist(a):
     return d
 
 
-def mst(W, calc_dist=True):
+def mst(W, calc_dist=True, method='dense', k=8, return_weights=False):
     """Determine the minimum spanning tree for a set of points represented
     by their inter-point distances. ie their `W`eights
 
@@ -193,16 +202,35 @@ def mst(W, calc_dist=True):
         False means that W is not a points array, but some other `weight`
         representing the interpoint relationship
 
+    method : text
+        `dense`, Prim's algorithm on the full weight matrix.  Required when W
+        is not a euclidean distance matrix.  `delaunay` or `knn` treat W as a
+        points array and build the euclidean tree from a sparse set of
+        candidate edges, see `emst`.
+
+    k : integer
+        Number of neighbours used for the candidate edges when method='knn'.
+
+    return_weights : boolean
+        True, also return the edge weights, in the order of `pairs`.
+
     Returns
     -------
     pairs - the pair of nodes that form the edges
     """
+    if method in ('delaunay', 'knn'):
+        if not calc_dist:
+            raise ValueError("{} requires a points array".format(method))
+        return emst(W, method=method, k=k, return_weights=return_weights)
+    if method != 'dense':
+        raise ValueError("method: 'dense', 'delaunay' or 'knn'")
     if calc_dist:
         W = _e_dist(W)
     if W.shape[0] != W.shape[1]:
         raise ValueError("W needs to be square matrix of edge weights")
     Np = W.shape[0]
     pairs = []
+    wghts = []
     pnts_seen = [0]  # Add the first point
     n_seen = 1
     # exclude self connections by assigning inf to the diagonal
@@ -214,13 +242,143 @@ def mst(W, calc_dist=True):
         new_edge = divmod(new_edge, Np)
         new_edge = [pnts_seen[new_edge[0]], new_edge[1]]
         pairs.append(new_edge)
+        wghts.append(W[new_edge[0], new_edge[1]])
         pnts_seen.append(new_edge[1])
         W[pnts_seen, new_edge[1]] = np.inf
         W[new_edge[1], pnts_seen] = np.inf
         n_seen += 1
+    if return_weights:
+        return np.vstack(pairs), np.asarray(wghts)
     return np.vstack(pairs)
 
 
+def emst(a, method='delaunay', k=8, return_weights=False):
+    """Euclidean minimum spanning tree of a point set, without the dense
+    distance matrix.
+
+    Parameters
+    ----------
+    a : array
+        An (N, 2) array of point coordinates.
+    method : text
+        `delaunay`, candidate edges from the Delaunay triangulation, which
+        always contains the euclidean minimum spanning tree.  `knn`, edges to
+        the `k` nearest neighbours of each point.  The knn graph may be
+        disconnected, in which case a spanning forest is returned.
+    k : integer
+        Number of neighbours for the `knn` candidate edges.
+    return_weights : boolean
+        True, also return the edge lengths.
+
+    Returns
+    -------
+    The (N-1, 2) array of `pairs`, ordered by increasing length, with the
+    smaller point index first.  Optionally the edge lengths.
+
+    Notes
+    -----
+    Duplicate points are joined to their first occurrence by zero length
+    edges.  Collinear point sets, which qhull can't triangulate, fall back to
+    the `knn` edges, as does `delaunay` if `triangulate` can't be imported.
+    The candidate edges are reduced with `_boruvka_`.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    N = len(a)
+    if N < 2:
+        empty = np.zeros((0, 2), dtype=np.intp)
+        return (empty, np.zeros(0)) if return_weights else empty
+    u, first, inv = np.unique(a, axis=0, return_index=True,
+                              return_inverse=True)
+    inv = inv.ravel()
+    e = None
+    if method == 'delaunay' and len(u) > 2:
+        from scipy.spatial import QhullError
+        try:
+            from triangulate import Del_edges
+            e = Del_edges(u)
+        except (ImportError, QhullError):
+            e = None
+    elif method not in ('delaunay', 'knn'):
+        raise ValueError("method: 'delaunay' or 'knn'")
+    if e is None:
+        e = _knn_edges_(u, k)
+    e = first[e]
+    dup = np.nonzero(first[inv] != np.arange(N))[0]
+    if dup.size:
+        e = np.concatenate((e, np.stack((first[inv[dup]], dup), axis=1)))
+    e.sort(axis=1)
+    diff = a[e[:, 0]] - a[e[:, 1]]
+    w = np.hypot(diff[:, 0], diff[:, 1])
+    keep = _boruvka_(N, e[:, 0], e[:, 1], w)
+    keep = keep[np.argsort(w[keep], kind='stable')]
+    pairs = e[keep]
+    if return_weights:
+        return pairs, w[keep]
+    return pairs
+
+
+def _knn_edges_(a, k=8):
+    """Unique (i, j), i < j, edges joining each point to its `k` nearest
+    neighbours."""
+    from scipy.spatial import cKDTree
+    N = len(a)
+    k = min(k, N - 1)
+    _, idx = cKDTree(a).query(a, k=k + 1)
+    i = np.repeat(np.arange(N), k)
+    j = idx[:, 1:].ravel()
+    lo = np.minimum(i, j).astype(np.int64)
+    hi = np.maximum(i, j)
+    key = np.unique(lo * N + hi)
+    return np.stack(divmod(key, N), axis=1)
+
+
+def _boruvka_(N, i, j, w):
+    """Return the indices of the edges (i, j, w) forming the minimum spanning
+    forest of the `N` nodes.
+
+    Each pass, every component picks its cheapest outgoing edge and the
+    components are merged by pointer jumping on a parent array, so the
+    union-find runs on whole arrays rather than one edge at a time.  Ties are
+    broken by edge order, which keeps the picked edges free of cycles.  At
+    most log2(N) passes are needed.
+    """
+    E = len(w)
+    order = np.argsort(w, kind='stable')
+    rank = np.empty(E, dtype=np.intp)
+    rank[order] = np.arange(E)
+    comp = np.arange(N)
+    chosen = np.zeros(E, dtype=bool)
+    live = np.arange(E)
+    while live.size:
+        ci = comp[i[live]]
+        cj = comp[j[live]]
+        m = ci != cj
+        live, ci, cj = live[m], ci[m], cj[m]
+        if not live.size:
+            break
+        best = np.full(N, E, dtype=np.intp)
+        r = rank[live]
+        np.minimum.at(best, ci, r)
+        np.minimum.at(best, cj, r)
+        c = np.nonzero(best < E)[0]
+        e = order[best[c]]
+        chosen[e] = True
+        # link each component to the other end of its edge
+        ei, ej = comp[i[e]], comp[j[e]]
+        parent = np.arange(N)
+        parent[c] = np.where(ei == c, ej, ei)
+        # mutual picks form 2-cycles, the smaller id becomes the root
+        mutual = (parent[parent[c]] == c) & (c < parent[c])
+        parent[c[mutual]] = c[mutual]
+        while True:
+            nxt = parent[parent]
+            if np.array_equal(nxt, parent):
+                break
+            parent = nxt
+        comp = parent[comp]
+    return np.nonzero(chosen)[0]
+
+
 def plot_mst(a, pairs):
     """plot minimum spanning tree test """
     plt.scatter(a[:, 0], a[:, 1])
@@ -245,14 +403,21 @@ def connect(a, dist_arr, edges):
     ----------
     a : array
         A point array
-    dist : array
-        The distance array, from _e_dist
+    dist : array or None
+        The distance array, from _e_dist, the edge weights returned by
+        mst(..., return_weights=True), or None to measure the edges from `a`.
     edge : array
         The edges derived from mst
     """
     p_f = edges[:, 0]
     p_t = edges[:, 1]
-    d = dist_arr[p_f, p_t]
+    if dist_arr is None:
+        diff = a[p_f] - a[p_t]
+        d = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+    elif np.ndim(dist_arr) == 1:
+        d = dist_arr
+    else:
+        d = dist_arr[p_f, p_t]
     n = p_f.shape[0]
     dt = [('Orig', '<i4'), ('Dest', 'i4'), ('Dist', '<f8')]
     out = np.zeros((n,), dtype=dt)
@@ -262,6 +427,24 @@ def connect(a, dist_arr, edges):
     return out
 
 
+def _bench_(sizes=(500, 2000, 100000, 1000000)):
+    """Time the dense Prim's tree against the delaunay and knn trees.  The
+    dense matrix is skipped above 5000 points.
+    """
+    import time
+    rng = np.random.RandomState(1)
+    frmt = "{:>10,} pnts  {:<9} {:8.3f} s  length {:14.3f}"
+    for n in sizes:
+        a = rng.uniform(0, 1000, size=(n, 2))
+        for method in ('dense', 'delaunay', 'knn'):
+            if method == 'dense' and n > 5000:
+                continue
+            t0 = time.perf_counter()
+            _, w = mst(a.copy(), method=method, return_weights=True)
+            t1 = time.perf_counter() - t0
+            print(frmt.format(n, method, t1, w.sum()))
+
+
 # ---------------------------------------------------------------------
 if __name__ == "__main__":
     """Main section...   """
@@ -272,3 +455,6 @@ if __name__ == "__main__":
 #    pairs = mst(d)                  # the orig-dest pairs for the mst
 #    plot_mst(a_srt, pairs)          # uncomment to plot
 #    o_d = connect(a_srt, d, pairs)  # produce an o-d structured array
+#    pairs, w = mst(a, method='delaunay', return_weights=True)
+#    o_d = connect(a, w, pairs)      # no distance matrix needed
+#    _bench_()
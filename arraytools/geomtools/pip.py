@@ -55,6 +55,18 @@ using the crossing number approach to test whether a point is within.
 >>> %timeit crossing_num(pnts, poly)
 369 ms ± 19.1 ms per loop (mean ± std. dev. of 7 runs, 1 loop each)
 
+(4) broadcast crossing_num, points tested against all edges in blocks:
+
+>>> _bench_(10000)  # letter C, 10,000 points in its extent
+
+Crossing number, 10,000 points, letter C polygon
+loop version      ...   0.2977 s  5,262 inside
+broadcast version ...   0.0044 s  5,262 inside
+speedup ...........   67.7x
+
+Many polygons, with holes, are handled by `pnts_in_polys` which returns the
+polygon index for each point (-1 if outside of all of them).
+
 """
 # pylint: disable=C0103  # invalid-name
 # pylint: disable=R0914  # Too many local variables
@@ -62,6 +74,8 @@ using the crossing number approach to test whether a point is within.
 # pylint: disable=W0105  # string statement has no effect
 
 # ----10| ------20| ------30| ------40| ------50| ------60| ------70| ------80|
+from textwrap import dedent
+import time
 import numpy as np
 #import arcpy
 
@@ -75,6 +89,7 @@ np.ma.masked_print_option.set_display('-')  # change to a single -
 __all__ = ['extent_poly',
            'pnts_in_extent',
            'pnts_in_poly',
+           'pnts_in_polys',
            '_crossing_num_']
 
 
@@ -118,15 +133,22 @@ def pnts_in_extent(pnts, ext, in_out=True):
     """
     pnts = np.atleast_2d(pnts)  # account for single point
     outside = None
-    LB, RT = ext
-    comp = np.logical_and((LB < pnts), (pnts <= RT))
-    idx_in = np.logical_and(comp[..., 0], comp[..., 1])
+    idx_in = _in_extent_(pnts, ext)
     inside = pnts[idx_in]
     if in_out:
         outside = pnts[~idx_in]  # invert case
     return inside, outside
 
 
+def _in_extent_(pnts, ext):
+    """The boolean mask used by `pnts_in_extent`.  `pnts_in_polys` uses it
+    directly so that the point indices are retained.
+    """
+    LB, RT = ext
+    comp = np.logical_and((LB < pnts), (pnts <= RT))
+    return np.logical_and(comp[..., 0], comp[..., 1])
+
+
 def p_in_ext(pnts, ext):
     """Same as pnts_in_ext without the `outside` check and return.
 
@@ -144,7 +166,78 @@ def p_in_ext(pnts, ext):
     return pnts[idx]
 
 
-def _crossing_num_(pnts, poly, in_out=False):
+# ---- crossing number engine ----------------------------------------------
+#
+def _edges_(poly):
+    """Return the edges of a polygon as an (N, 4) array of `x0, y0, x1, y1`.
+
+    `poly` is either a single ring (an (N, 2) array) or a sequence of rings,
+    the outer ring first followed by any holes.  Rings that are not closed
+    are closed, so that every ring contributes all of its edges.
+    """
+    if isinstance(poly, np.ndarray) and poly.dtype.kind != 'O' and \
+            poly.ndim == 2:
+        rings = [poly]
+    else:
+        rings = [np.asarray(r) for r in poly]
+    segs = []
+    for r in rings:
+        if not np.all(r[0] == r[-1]):
+            r = np.concatenate((r, r[:1]), axis=0)
+        segs.append(np.concatenate((r[:-1], r[1:]), axis=1))
+    return np.concatenate(segs, axis=0).astype(np.float64)
+
+
+def _crossings_(pnts, edges, rule='even-odd'):
+    """Test points against all the edges of a polygon at once.
+
+    Parameters
+    ----------
+    pnts : array
+        (N, 2) array of points
+    edges : array
+        (E, 4) array of edges produced by `_edges_`
+    rule : text
+        `even-odd` uses the crossing number parity.  `winding` uses a
+        non-zero winding number, which requires the holes to be ordered
+        opposite to the outer ring.
+
+    Notes
+    -----
+    The points form the rows and the edges the columns of the (N, E)
+    comparison.  An edge is counted if it straddles the horizontal ray from
+    the point, `(y0 > y) != (y1 > y)` as in **pnpoly**, and the crossing lies
+    to the right of the point.  Horizontal edges never straddle the ray.
+    """
+    x = pnts[:, :1]
+    y = pnts[:, 1:2]
+    x0, y0, x1, y1 = edges.T
+    above0 = y0 > y
+    above1 = y1 > y
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = x0 + (y - y0) / (y1 - y0) * (x1 - x0)
+    left = x < x_cross
+    if rule == 'winding':
+        up = np.count_nonzero(~above0 & above1 & left, axis=1)
+        down = np.count_nonzero(above0 & ~above1 & left, axis=1)
+        return (up - down) != 0
+    cn = np.count_nonzero((above0 != above1) & left, axis=1)
+    return (cn % 2) == 1
+
+
+def _pip_chunked_(pnts, edges, rule='even-odd', chunk=2**22):
+    """Run `_crossings_` over blocks of points so that no more than `chunk`
+    point-edge pairs are evaluated at once.
+    """
+    N = len(pnts)
+    step = max(1, chunk // max(len(edges), 1))
+    is_in = np.zeros((N,), dtype=bool)
+    for i in range(0, N, step):
+        is_in[i:i + step] = _crossings_(pnts[i:i + step], edges, rule)
+    return is_in
+
+
+def _crossing_num_(pnts, poly, in_out=False, rule='even-odd', chunk=2**22):
     """Used by `pnts_in_poly`.  The implementation of pnply
 
     Parameters
@@ -154,23 +247,37 @@ def _crossing_num_(pnts, poly, in_out=False):
     poly : array
         Same as `pnts`, but a duplicate point representing the first and last
         to ensure close of the polygon.  Polygons are ordered clockwise for
-        outer rings and counter-clockwise for inner rings.  The polygons are
-        assumed to be single-part polgons.
+        outer rings and counter-clockwise for inner rings.  A sequence of
+        rings (outer ring first, then the holes) is also accepted.
     in_out : boolean
         True, retains both sets of points (inside and outside the polygon).
         False retains the outside points
+    rule : text
+        `even-odd` or `winding`, see `_crossings_`
+    chunk : integer
+        The maximum number of point-edge pairs evaluated at once.
 
     Returns
     -------
     The points inside the polygon
+
     Notes
     -----
-    The functions, ``pnts_in_ext``, and  ``ext_poly`` are required
+    The functions, ``pnts_in_ext``, and  ``ext_poly`` are required.  The
+    points within the extent are tested against all edges by broadcasting,
+    in blocks of points, rather than one point and one edge at a time.
+    """
+    edges = _edges_(poly)
+    xy = edges[:, :2]
+    ext = np.array([xy.min(axis=0), xy.max(axis=0)])
+    inside, outside = pnts_in_extent(pnts, ext, in_out=in_out)
+    is_in = _pip_chunked_(inside, edges, rule=rule, chunk=chunk)
+    return inside[is_in], outside
+
 
-    Base logical check in parts
-    >>> u = ys[i] <= y < ys[i+1]
-    >>> d = ys[i] >= y > ys[i+1]
-    >>> np.logical_or(u, d)
+def _crossing_num_loop_(pnts, poly, in_out=False):
+    """The original per-point, per-edge crossing number.  Retained for
+    benchmarking `_crossing_num_`.  See `_bench_`.
     """
     xs = poly[:, 0]
     ys = poly[:, 1]
@@ -217,6 +324,90 @@ def pnts_in_poly(pnts, poly, in_out=False):
     return inside, outside
 
 
+def pnts_in_polys(pnts, polys, rule='even-odd', chunk=2**22, tree=None):
+    """Assign points to the polygon that contains them.
+
+    Parameters
+    ----------
+    pnts : array
+        (N, 2) point array
+    polys : sequence
+        A list of polygons.  Each polygon is a closed ring or a sequence of
+        rings, outer ring first followed by its holes.
+    rule : text
+        `even-odd` or `winding`, see `_crossings_`
+    chunk : integer
+        The maximum number of point-edge pairs evaluated at once.  This bounds
+        the size of the temporary (chunk, edges) arrays.
+    tree : array
+        Optional spatial index of the polygon extents from `sindex.str_tree`.
+        Build it once with ``str_tree(poly_extents(polys))``.
+
+    Returns
+    -------
+    An integer array, one per point, of the index of the polygon containing
+    the point.  Points not in any polygon are -1.  For overlapping polygons,
+    the first polygon in `polys` wins.
+
+    Notes
+    -----
+    Without a `tree`, each polygon uses the `pnts_in_extent` test as its first
+    stage, so only unassigned points within its extent reach the crossing
+    number test.  With a `tree`, the candidate points for each polygon come
+    from the index and polygons without candidates are never visited.  The
+    same extent test is applied to them, so both give the same result for
+    points on an extent boundary.
+    """
+    pnts = np.atleast_2d(pnts)
+    idx = np.full((len(pnts),), -1, dtype=np.int64)
+    if tree is None:
+        work = ((i, p, None) for i, p in enumerate(polys))
+    else:
+        from arraytools.sindex import tree_query_pnts
+        q, g = tree_query_pnts(tree, pnts)
+        order = np.lexsort((q, g))     # group the points by polygon
+        q, g = q[order], g[order]
+        ids, starts = np.unique(g, return_index=True)
+        work = zip(ids, [polys[i] for i in ids], np.split(q, starts[1:]))
+    for i, poly, cand in work:
+        edges = _edges_(poly)
+        xy = edges[:, :2]
+        ext = np.array([xy.min(axis=0), xy.max(axis=0)])
+        if cand is None:
+            cand = np.nonzero(_in_extent_(pnts, ext) & (idx == -1))[0]
+        else:  # the index boxes are inclusive, `_in_extent_` is not
+            cand = cand[(idx[cand] == -1) & _in_extent_(pnts[cand], ext)]
+        if cand.size == 0:
+            continue
+        is_in = _pip_chunked_(pnts[cand], edges, rule=rule, chunk=chunk)
+        idx[cand[is_in]] = i
+    return idx
+
+
+def _bench_(N=10000, reps=3):
+    """Compare the loop and broadcast versions of the crossing number using
+    the letter `C` polygon in `_demo` and `N` points within its extent.
+    """
+    c = np.array([[0, 0], [0, 100], [100, 100], [100, 80],
+                  [20, 80], [20, 20], [100, 20], [100, 0], [0, 0]])
+    pnts = np.random.uniform(0., 100., size=(N, 2))
+    result = []
+    for func in (_crossing_num_loop_, _crossing_num_):
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            inside, _ = func(pnts, c)
+        result.append([(time.perf_counter() - t0)/reps, len(inside)])
+    frmt = """
+    Crossing number, {:,} points, letter C polygon
+    loop version      ... {:8.4f} s  {:,} inside
+    broadcast version ... {:8.4f} s  {:,} inside
+    speedup ........... {:6.1f}x
+    """
+    args = [N, *result[0], *result[1], result[0][0]/result[1][0]]
+    print(dedent(frmt).format(*args))
+    return result
+
+
 def _demo():
     """ used in the testing
     : polygon layers
@@ -111,6 +111,27 @@ def Del_pnts(pnts, testing=False, plot=True):
     return del_pnts, pnts, simps
 
 
+def Del_edges(pnts):
+    """Return the unique edges of the Delaunay triangulation of the points
+    as an (N, 2) array of point indices, smallest index first.
+
+    Notes
+    -----
+    The points are centred on their mean, as in `Del_pnts`, but they are not
+    made unique here, so the indices refer to the input points.  Remove
+    duplicates first, since qhull drops them from the triangulation.
+    """
+    pnts = np.asarray(pnts, dtype=np.float64)
+    avg = np.mean(pnts, axis=0)
+    tri = Delaunay(pnts - avg)
+    s = tri.simplices
+    e = np.concatenate((s[:, [0, 1]], s[:, [1, 2]], s[:, [2, 0]]), axis=0)
+    e.sort(axis=1)
+    n = len(pnts)
+    key = np.unique(e[:, 0].astype(np.int64) * n + e[:, 1])
+    return np.stack(divmod(key, n), axis=1)
+
+
 # ---- Do the work
 #
 
@@ -15,7 +15,8 @@ Useage:
 
 Functions:
 ---------_
-a_filter(a, mode=1, ignore_ndata=True)  # mode is a 3x3 filter
+a_filter(a, mode=1, ignore_ndata=True)  # mode is a catalogue number
+convolve(a, kernel, nodata=None, how='propagate', method='auto')
 
 References:
 :
@@ -44,7 +45,7 @@ warnings.filterwarnings('ignore')
 
 __all__ = ['_even_odd',
            '_pad_even_odd', '_pad_nan', '_pad_zero',
-           'a_filter',
+           'convolve', 'a_filter',
            'plot_img',
            'rgb_gray', 'normalize', 'equalize']
 
@@ -88,29 +89,221 @@ def _pad_zero(a, n=1):
 # ----------------------------------------------------------------------
 # (1) filter array ---- convolution filters
 #
-def a_filter(a, mode=1, pad_output=True, ignore_nodata=True, nodata=None):
+n_ = np.nan
+filter_catalogue = {
+    1: [1, 1, 1, 1, 1, 1, 1, 1, 1],      # all_f
+    2: [1, 1, 1, 1, n_, 1, 1, 1, 1],     # no_cnt
+    3: [1, 0, 1, 0, 0, 0, 1, 0, 1],      # cross_f
+    4: [0, 1, 0, 1, 0, 1, 0, 1, 0],      # plus_f
+    5: [1, 0, -1, 2, 0, -2, 1, 0, -1],   # grad_e
+    6: [-1, -2, -1, 0, 0, 0, 1, 2, 1],   # grad_n
+    7: [0, -1, -2, 1, 0, -1, 2, 1, 0],   # grad_ne
+    8: [2, -1, 0, -1, 0, 1, 0, 1, 2],    # grad_nw
+    9: [1, 2, 1, 0, 0, 0, -1, -2, -1],   # grad_s
+    10: [-1, 0, 1, -2, 0, 2, -1, 0, 1],  # grad_w
+    11: [0, -1, 0, -1, 4, -1, 0, -1, 0],  # lap_33
+    12: [-1, -1, -1, 2, 2, 2, -1, -1, -1],  # line_h
+    13: [2, -1, -1, -1, 2, -1, -1, -1, 2],  # line_ld
+    14: [-1, -1, 2, -1, 2, -1, 2, -1, -1],  # line_rd
+    15: [-1, 0, -1, -1, 2, -1, -1, 2, -1],  # line_v
+    16: [-0.7, -1.0, -0.7, -1.0, 6.8, -1.0, -0.7, -1.0, -0.7],  # high, arc
+    17: [1, 2, 1, 0, 0, 0, -1, -2, -1],  # sob_hor, sobel y  /4.0 weights
+    18: [1, 0, -1, 2, 0, -2, 1, 0, -1],  # sob_vert, sobel x  /4
+    19: [-1, -1, 0, -1, 0, 1, 0, 1, 1],  # emboss
+    20: [0., -0.25, 0., -0.25, 2.0, -0.25, 0., -0.25, 0.],  # sharp1, arc
+    21: [-0.25, -0.25, -0.25, -0.25, 3.0, -0.25, -0.25, -0.25, -0.25],
+    23: [-1, -1, -1, -1, 9, -1, -1, -1, -1],  # sharp3, arc
+    24: [1, 2, 1, 2, 4, 2, 1, 2, 1]}  # lowpass, arc
+del n_
+
+
+def _get_filter_(mode):
+    """Return the kernel for a `mode` number in `filter_catalogue` or an
+    odd sized 2D kernel passed in as `mode`.
+    """
+    if np.ndim(mode) == 0:
+        return np.array(filter_catalogue[mode]).reshape(3, 3)
+    k = np.asarray(mode)
+    if k.ndim != 2 or not all(np.mod(k.shape, 2)):
+        raise ValueError("An odd sized 2D kernel is required")
+    return k
+
+
+def _separable_(k, tol=1e-10):
+    """Split kernel `k` into a column and row vector if it is rank 1, so that
+    np.outer(col, row) == k.  Returns None otherwise.
+    """
+    if min(k.shape) == 1:
+        return k[:, 0], k[0]
+    u, s, vt = np.linalg.svd(k)
+    if s[0] == 0 or s[1] > tol * s[0]:
+        return None
+    sq = np.sqrt(s[0])
+    return u[:, 0] * sq, vt[0] * sq
+
+
+def _corr_direct_(A, k):
+    """Valid correlation of `A` and `k` by accumulating shifted slices, one
+    per nonzero weight.
+    """
+    m, n = k.shape
+    R, C = A.shape[0] - m + 1, A.shape[1] - n + 1
+    c = np.zeros((R, C))
+    for i, j in zip(*np.nonzero(k)):
+        w = k[i, j]
+        if w == 1:
+            c += A[i:i + R, j:j + C]
+        else:
+            c += w * A[i:i + R, j:j + C]
+    return c
+
+
+def _corr_separable_(A, col, row):
+    """Valid correlation with the separable kernel np.outer(col, row), as a
+    pass along the rows followed by one down the columns.
+    """
+    t = _corr_direct_(A, row.reshape(1, -1))
+    return _corr_direct_(t, col.reshape(-1, 1))
+
+
+def _corr_fft_(A, k):
+    """Valid correlation by FFT.  The circular convolution over the band's
+    own shape is exact once the first m-1 rows and n-1 columns are dropped,
+    so no padding is needed.
+    """
+    m, n = k.shape
+    s = A.shape
+    f = np.fft.rfft2(A, s) * np.fft.rfft2(k[::-1, ::-1], s)
+    return np.fft.irfft2(f, s)[m - 1:, n - 1:]
+
+
+def _conv_method_(k, method='auto'):
+    """Choose the correlation used for kernel `k`.  Returns (name, func)
+    where func(A) gives the valid correlation of a band `A`.
+    """
+    if method == 'auto':  # cost in slice passes, an fft band is ~25
+        sep = _separable_(k)
+        cost = {'direct': np.count_nonzero(k), 'fft': 25}
+        if sep is not None:  # 2 passes and an intermediate array
+            cost['separable'] = 1.5 * (np.count_nonzero(sep[0]) +
+                                       np.count_nonzero(sep[1]))
+        method = min(cost, key=cost.get)
+    if method == 'separable':
+        sep = _separable_(k)
+        if sep is None:
+            raise ValueError("The kernel is not separable")
+        return method, lambda A: _corr_separable_(A, *sep)
+    if method == 'direct':
+        return method, lambda A: _corr_direct_(A, k)
+    if method == 'fft':
+        return method, lambda A: _corr_fft_(A, k)
+    raise ValueError("method: 'auto', 'separable', 'direct' or 'fft'")
+
+
+def convolve(a, kernel, nodata=None, how='propagate', method='auto',
+             tile=None, out=None):
+    """Apply an odd sized kernel to a 2D array, using the same orientation as
+    `a_filter`, ie. sum(window * kernel) without flipping the kernel.
+
+    Parameters
+    ----------
+    a : array
+        2D array or np.memmap.  np.nan and `nodata` cells are nodata.
+    kernel : array
+        An odd sized 2D kernel.  np.nan weights are treated as 0.
+    how : text
+        The treatment of nodata cells in a window.
+
+        - propagate : any nodata cell under a nonzero weight gives np.nan
+        - zero : nodata cells count as 0, as np.nansum would
+        - normalize : nodata cells are left out and the sum is rescaled by
+          sum(abs(kernel)) / sum(abs(kernel) of the valid cells).  For a
+          kernel of positive weights, this is the mean of the valid cells
+          times the kernel sum.  Windows with no valid cells are np.nan.
+    method : text
+        `auto`, `separable`, `direct` or `fft`.  `auto` picks the cheapest:
+        1D passes for a rank 1 kernel (lowpass, sobel), shifted slice
+        accumulation for a few nonzero weights or FFT for large kernels.
+    tile : integer
+        Output rows per band.  The bands, and a halo of kernel rows - 1, are
+        read from `a` one at a time, so `a` and `out` can be memmaps.
+    out : array
+        Optional float array of the output shape, ie. a np.memmap.
+
+    Returns
+    -------
+    The (rows - kr + 1, cols - kc + 1) float64 result, where (kr, kc) is the
+    kernel shape.  Use `a_filter` for a padded, masked output.
+    """
+    k = np.nan_to_num(np.asarray(kernel, dtype=np.float64))
+    if k.ndim != 2 or not all(np.mod(k.shape, 2)):
+        raise ValueError("An odd sized 2D kernel is required")
+    if how not in ('propagate', 'zero', 'normalize'):
+        raise ValueError("how: 'propagate', 'zero' or 'normalize'")
+    m, n = k.shape
+    R, C = a.shape[0] - m + 1, a.shape[1] - n + 1
+    if a.ndim != 2 or R < 1 or C < 1:
+        raise ValueError("A 2D array, larger than the kernel, is required")
+    _, func = _conv_method_(k, method)
+    k_abs = np.abs(k)
+    _, func_w = _conv_method_(k_abs if how == 'normalize' else
+                              (k != 0).astype(np.float64), method)
+    k_sum = k_abs.sum()
+    if tile is None:
+        tile = max(1, 2**20 // max(a.shape[1], 1))
+        if m > 7:
+            tile = max(tile, 4 * m)
+    if out is None:
+        out = np.empty((R, C), dtype=np.float64)
+    for r0 in range(0, R, tile):
+        r1 = min(r0 + tile, R)
+        A = np.array(a[r0:r1 + m - 1], dtype=np.float64)
+        bad = np.isnan(A)
+        if nodata is not None:
+            bad |= A == nodata
+        if not bad.any():
+            out[r0:r1] = func(A)
+            continue
+        A[bad] = 0
+        c = func(A)
+        if how == 'propagate':
+            c[func_w(bad.astype(np.float64)) > 0.5] = np.nan
+        elif how == 'normalize':
+            w = func_w((~bad).astype(np.float64))
+            w[w < 1e-9 * k_sum] = np.nan
+            c *= k_sum / w
+        out[r0:r1] = c
+    return out
+
+
+def a_filter(a, mode=1, pad_output=True, ignore_nodata=True, nodata=None,
+             normalize=False, method='auto', tile=None):
     """Various filters applied to an array.
 
     Requires:
     --------
-    stride : function
-        the `stride` function is used internally in this function
     a : array
-        an array that will be strided using a 3x3 window
+        a 2D array, or np.memmap
     pad_output : boolean
         True, produces a masked array padded so that the shape
         is the same as the input
     ignore_nodata : boolean
-        True, all values used, False, array contains nodata
+        True, all values used, nodata (np.nan) in a window gives np.nan.
+        False, array contains nodata, which counts as 0, as in np.nansum.
     nodata : None or number
         None :
             max int or float used
         value :
             use this value in integer or float form otherwise
-
+    normalize : boolean
+        True, nodata cells are left out of the windows and the result is
+        rescaled by the kernel weight of the valid cells.  See `convolve`.
+    method, tile :
+        passed on to `convolve`
 
     mode :
-        a dictionary containing a choice from
+        a number from `filter_catalogue` or any odd sized 2D kernel,
+        ie. `surface.kernels('f_d8')` or a 7x7 gaussian.
     ::
 
         1.  `all_f`    : all 1's
@@ -134,8 +327,10 @@ def a_filter(a, mode=1, pad_output=True, ignore_nodata=True, nodata=None):
 
     Notes:
     -----
-        Only 3x3 filters covered here.  The output array is padded with np.nan
-        and the array is returned as a masked array.
+        The kernel is applied by `convolve`, which avoids the strided
+        (rows, cols, 3, 3) temporary of `_a_filter_strided_`.  The output
+        array is padded by half the kernel size and returned as a masked
+        array.  Integer arrays and kernels return integers.
 
     >>> a0 = pyramid(core=4, steps=5, incr=(1, 1))
     >>> a0 = a0 * 2  # multiply by a number to increase slope
@@ -153,56 +348,42 @@ def a_filter(a, mode=1, pad_output=True, ignore_nodata=True, nodata=None):
     [3]
     https://github.com/scikit-image/scikit-image/tree/master/skimage/filters
     """
-    n = np.nan
-    all_f = [1, 1, 1, 1, 1, 1, 1, 1, 1]
-    no_cnt = [1, 1, 1, 1, n, 1, 1, 1, 1]
-    cross_f = [1, 0, 1, 0, 0, 0, 1, 0, 1]
-    plus_f = [0, 1, 0, 1, 0, 1, 0, 1, 0]
-    grad_e = [1, 0, -1, 2, 0, -2, 1, 0, -1]
-    grad_n = [-1, -2, -1, 0, 0, 0, 1, 2, 1]
-    grad_ne = [0, -1, -2, 1, 0, -1, 2, 1, 0]
-    grad_nw = [2, -1, 0, -1, 0, 1, 0, 1, 2]
-    grad_s = [1, 2, 1, 0, 0, 0, -1, -2, -1]
-    grad_w = [-1, 0, 1, -2, 0, 2, -1, 0, 1]
-    lap_33 = [0, -1, 0, -1, 4, -1, 0, -1, 0]
-    line_h = [-1, -1, -1, 2, 2, 2, -1, -1, -1]
-    line_ld = [2, -1, -1, -1, 2, -1, -1, -1, 2]
-    line_rd = [-1, -1, 2, -1, 2, -1, 2, -1, -1]
-    line_v = [-1, 0, -1, -1, 2, -1, -1, 2, -1]
-    high = [-0.7, -1.0, -0.7, -1.0, 6.8, -1.0, -0.7, -1.0, -0.7]  # arc
-    sob_hor = [1, 2, 1, 0, 0, 0, -1, -2, -1]   # sobel y  /4.0 weights
-    sob_vert = [1, 0, -1, 2, 0, -2, 1, 0, -1]  # sobel x  /4
-    emboss = [-1, -1, 0, -1, 0, 1, 0, 1, 1]
-    sharp1 = [0., -0.25, 0., -0.25, 2.0, -0.25, 0., -0.25, 0.]  # arc
-    sharp2 = [-0.25, -0.25, -0.25, -0.25, 3.0, -0.25, -0.25, -0.25, -0.25]
-    sharp3 = [-1, -1, -1, -1, 9, -1, -1, -1, -1]  # arc
-    lowpass = [1, 2, 1, 2, 4, 2, 1, 2, 1]  # arc
-    # ---- assemble the dictionary ----
-    d = {1: all_f, 2: no_cnt, 3: cross_f, 4: plus_f, 5: grad_e,
-         6: grad_n, 7: grad_ne, 8: grad_nw, 9: grad_s, 10: grad_w,
-         11: lap_33, 12: line_h, 13: line_ld, 14: line_rd, 15: line_v,
-         16: high, 17: sob_hor, 18: sob_vert, 19: emboss, 20: sharp1,
-         21: sharp2, 23: sharp3, 24: lowpass}
-    filter_ = np.array(d[mode]).reshape(3, 3)
-    # ---- stride the input array ----
-    a_strided = stride(a)
-    if ignore_nodata:
-        c = np.sum(a_strided * filter_, axis=(2, 3))
-    else:
-        c = np.nansum(a_strided * filter_, axis=(2, 3))
+    filter_ = _get_filter_(mode)
+    how = 'propagate' if ignore_nodata else 'zero'
+    if normalize:
+        how = 'normalize'
+    c = convolve(a, filter_, how=how, method=method, tile=tile)
+    dt = np.result_type(a.dtype, filter_.dtype)
+    if dt.kind in 'iu' and how != 'normalize':
+        c = np.rint(c).astype(dt)
     if pad_output:
         pad_ = nodata
         if nodata is None:
             if c.dtype.name in ('int', 'int32', 'int64'):
                 pad_ = min([0, -1, a.min()-1])
             else:
-                pad_ = min([0.0, -1.0, a.min()-1])
-        c = np.lib.pad(c, (1, 1), "constant", constant_values=(pad_, pad_))
+                pad_ = min([0.0, -1.0, np.nanmin(a)-1])
+        p = (filter_.shape[0] // 2, filter_.shape[1] // 2)
+        c = np.pad(c, (p[:1] * 2, p[1:] * 2), "constant",
+                   constant_values=(pad_, pad_))
         m = np.where(c == pad_, 1, 0)
         c = np.ma.array(c, mask=m, fill_value=None)
     return c
 
 
+def _a_filter_strided_(a, mode=1, ignore_nodata=True):
+    """The original 3x3 `a_filter`, from `stride(a)`, without the padding.
+    Kept for `_bench_filter`.
+    """
+    filter_ = np.array(filter_catalogue[mode]).reshape(3, 3)
+    a_strided = stride(a)
+    if ignore_nodata:
+        c = np.sum(a_strided * filter_, axis=(2, 3))
+    else:
+        c = np.nansum(a_strided * filter_, axis=(2, 3))
+    return c
+
+
 def plot_img(img):
     """plot image as gray scale"""
     import matplotlib.pyplot as plt
@@ -263,6 +444,40 @@ def _demo():
     return a
 
 
+def _bench_filter(shape=(4000, 4000), modes=(1, 11, 17, 24),
+                  sizes=(5, 15, 31, 61)):
+    """Time `a_filter` against the strided version, then the convolve
+    methods for larger gaussian and random kernels.
+    """
+    import time
+    a = np.random.default_rng(1).random(shape)
+    print("{} array".format(shape))
+    for mode in modes:
+        t0 = time.perf_counter()
+        old = _a_filter_strided_(a, mode)
+        t1 = time.perf_counter()
+        new = a_filter(a, mode, pad_output=False)
+        t2 = time.perf_counter()
+        print("mode {:>2}  strided {:6.3f} s  convolve {:6.3f} s  "
+              "max diff {:.1e}".format(mode, t1 - t0, t2 - t1,
+                                        np.abs(old - new).max()))
+    for n in sizes:
+        g = np.exp(-np.linspace(-2, 2, n)**2)
+        for nm, k in [('gauss', np.outer(g, g)),
+                      ('random', np.random.random((n, n)))]:
+            tms = []
+            for meth in ('separable', 'direct', 'fft'):
+                if (meth == 'separable' and nm == 'random') or \
+                   (meth == 'direct' and n > 15):
+                    tms.append("     -  ")
+                    continue
+                t0 = time.perf_counter()
+                convolve(a, k, method=meth)
+                tms.append("{:6.3f} s".format(time.perf_counter() - t0))
+            print("{:>2}x{:<2} {:<6}  separable {}  direct {}  fft {}  "
+                  "auto: {}".format(n, n, nm, *tms, _conv_method_(k)[0]))
+
+
 # ----------------------------------------------------------------------
 # __main__ .... code section
 if __name__ == "__main__":
@@ -0,0 +1,244 @@
+# -*- coding: UTF-8 -*-
+"""
+overviews
+=========
+
+Script:   overviews.py
+
+Author:   Dan.Patterson@carleton.ca
+
+Modified: 2019-01-12
+
+Purpose:  power of two overviews (pyramids) for large rasters
+
+Requires:
+---------
+    arraytools.grid - aggregate
+    arraytools._io - load_npy
+
+Notes:
+------
+`build_overviews` reads a raster once, a band of rows at a time, and writes
+each level as a `.npy` file plus a small json index to a folder.  Level k is
+reduced by 2**k in rows and columns.  `Overviews` opens the folder with the
+levels memory mapped and `window` returns any part of the raster at any
+reduction factor from the nearest finer level, so a viewer, or a plot, reads
+what it shows rather than the full resolution array.
+
+>>> ovr = build_overviews(a, folder, resampling='mean', nodata=-1)
+>>> ovr = Overviews(folder)      # later on
+>>> ovr.fit(max_shape=(400, 600))             # the whole raster
+>>> ovr.window(5000, 2000, 8000, 8000, factor=10)  # part of it
+
+References:
+-----------
+
+`<https://gdal.org/programs/gdaladdo.html>`_.
+
+"""
+# pylint: disable=C0103
+# pylint: disable=R1710
+# pylint: disable=R0914
+
+# ---- imports, formats, constants ----
+import sys
+import os
+import json
+import numpy as np
+from arraytools._io import load_npy
+from arraytools.grid import aggregate
+
+ft = {'bool': lambda x: repr(x.astype(np.int32)),
+      'float_kind': '{: 0.3f}'.format}
+np.set_printoptions(edgeitems=5, linewidth=100, precision=2, suppress=True,
+                    threshold=150, formatter=ft)
+
+script = sys.argv[0]  # print this should you need to locate the script
+
+__all__ = ['Overviews', 'build_overviews']
+
+index_name = "overviews.json"
+
+
+class Overviews(object):
+    """The overview levels of a raster, from the folder written by
+    `build_overviews`.  The levels are opened as read-only memory maps.
+
+    Parameters
+    ----------
+    path : text
+        Folder containing `overviews.json` and the level files.
+
+    Notes
+    -----
+    `ovr[k]` is level k, whose cell (i, j) covers rows i*2**k to
+    (i+1)*2**k and the same for the columns, of level 0.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, index_name)) as f:
+            self.index = json.load(f)
+        self.shape = tuple(self.index['shape'])
+        self.dtype = np.dtype(self.index['dtype'])
+        self.resampling = self.index['resampling']
+        self.nodata = self.index['nodata']
+        self.factors = [lev['factor'] for lev in self.index['levels']]
+        self._levels = {}
+
+    def __len__(self):
+        return len(self.factors)
+
+    def __repr__(self):
+        frmt = "Overviews: {} levels of {}, {}, factors {}\n  path: {}"
+        return frmt.format(len(self), self.shape, self.resampling,
+                           self.factors, self.path)
+
+    def __getitem__(self, k):
+        if k not in self._levels:
+            f = self.index['levels'][k]['file']
+            if not os.path.isabs(f):
+                f = os.path.join(self.path, f)
+            self._levels[k] = load_npy(f, mmap_mode='r')
+        return self._levels[k]
+
+    def level_for(self, factor):
+        """The coarsest level whose factor is <= `factor`."""
+        k = np.searchsorted(self.factors, factor, side='right') - 1
+        return int(max(k, 0))
+
+    def window(self, r0=0, c0=0, rows=None, cols=None, factor=1):
+        """Return rows r0 to r0+rows and cols c0 to c0+cols of the full
+        resolution raster, reduced by `factor`, a number >= 1.
+
+        The values come from the nearest level at or below `factor`.  Its
+        cells are sampled at the centres of the output cells, so a power of
+        two factor, on a window aligned to it, is a slice of that level.
+        The result has shape (ceil(rows/factor), ceil(cols/factor)).
+        """
+        R, C = self.shape
+        rows = R - r0 if rows is None else min(rows, R - r0)
+        cols = C - c0 if cols is None else min(cols, C - c0)
+        if rows < 1 or cols < 1 or factor < 1:
+            raise ValueError("An empty window or a factor < 1")
+        k = self.level_for(factor)
+        L = self.factors[k]
+        a = self[k]
+        ri = ((r0 + (np.arange(int(np.ceil(rows / factor))) + 0.5) *
+               factor) // L).astype(np.intp)
+        ci = ((c0 + (np.arange(int(np.ceil(cols / factor))) + 0.5) *
+               factor) // L).astype(np.intp)
+        np.minimum(ri, a.shape[0] - 1, out=ri)
+        np.minimum(ci, a.shape[1] - 1, out=ci)
+        w = np.asarray(a[ri[0]:ri[-1] + 1, ci[0]:ci[-1] + 1])
+        return w[np.ix_(ri - ri[0], ci - ci[0])]
+
+    def fit(self, max_shape=(512, 512), r0=0, c0=0, rows=None, cols=None):
+        """Return the window at the smallest factor that fits within
+        `max_shape`, ie. the screen or plot size.  See `window`.
+        """
+        R, C = self.shape
+        rows = R - r0 if rows is None else rows
+        cols = C - c0 if cols is None else cols
+        factor = max(1, rows / max_shape[0], cols / max_shape[1])
+        factor *= 1 + 1e-9  # keep ceil(rows / factor) <= max_shape
+        return self.window(r0, c0, rows, cols, factor=factor)
+
+
+def build_overviews(a, path, resampling='mean', nodata=None, min_size=256,
+                    tile=None):
+    """Build power of two overviews of `a` in the folder `path`.
+
+    Parameters
+    ----------
+    a : array or text
+        2D array, np.memmap or the name of a `.npy` file.  A file is used
+        as level 0 in place, an array is saved as `ovr_0.npy`.
+    resampling : text
+        mean : the mean of the valid cells, nodata aware, as float64
+        nearest : the top left cell of each block
+        mode : the most common valid value, the smaller on ties
+    nodata : number
+        Passed on to `grid.aggregate`.
+    min_size : integer
+        Levels are added until the rows and columns are both <= min_size.
+    tile : integer
+        Rows read per band, rounded to a multiple of the coarsest block.
+
+    Returns
+    -------
+    The `Overviews` of `path`.
+
+    Notes
+    -----
+    Level 0 is read once.  Each band is a multiple of the coarsest block in
+    rows, so `aggregate` produces every level from it in one call and the
+    results are written at their offsets in the level files.
+    """
+    if resampling not in ('mean', 'nearest', 'mode'):
+        raise ValueError("resampling: 'mean', 'nearest' or 'mode'")
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    if isinstance(a, str):
+        src = os.path.abspath(a)
+        a = load_npy(src, mmap_mode='r')
+    else:
+        src = "ovr_0.npy"
+        lev0 = np.lib.format.open_memmap(os.path.join(path, src), mode='w+',
+                                         dtype=a.dtype, shape=a.shape)
+    if a.ndim != 2:
+        raise ValueError("A 2D array is required")
+    R, C = a.shape
+    n = 0
+    while max(-(-R // 2**n), -(-C // 2**n)) > min_size:
+        n += 1
+    dt = np.float64 if resampling == 'mean' else a.dtype
+    levels = [{'level': 0, 'factor': 1, 'file': src, 'shape': [R, C]}]
+    outs = []
+    for k in range(1, n + 1):
+        f = "ovr_{}.npy".format(k)
+        shp = (-(-R // 2**k), -(-C // 2**k))
+        outs.append(np.lib.format.open_memmap(os.path.join(path, f),
+                                              mode='w+', dtype=dt,
+                                              shape=shp))
+        levels.append({'level': k, 'factor': 2**k, 'file': f,
+                       'shape': list(shp)})
+    B = 2**n
+    if tile is None:
+        tile = 2**22 // max(C, 1)
+    tile = max(B, -(-tile // B) * B)
+    for r0 in range(0, R, tile):
+        A = np.asarray(a[r0:r0 + tile])
+        if src == "ovr_0.npy":
+            lev0[r0:r0 + tile] = A
+        if n == 0:
+            continue
+        if resampling == 'nearest':
+            res = [A[::2**k, ::2**k] for k in range(1, n + 1)]
+        else:
+            res = aggregate(A, 2, resampling, nodata=nodata, levels=n)
+            res = [res] if n == 1 else res
+        for k, r in enumerate(res):
+            s = r0 // 2**(k + 1)
+            outs[k][s:s + r.shape[0]] = r
+    for o in outs:
+        o.flush()
+    if src == "ovr_0.npy":
+        lev0.flush()
+    if nodata is not None:
+        nodata = np.asarray(nodata).item()  # json needs python numbers
+    index = {'shape': [R, C], 'dtype': np.dtype(a.dtype).str,
+             'resampling': resampling, 'nodata': nodata, 'levels': levels}
+    with open(os.path.join(path, index_name), 'w') as f:
+        json.dump(index, f, indent=2)
+    return Overviews(path)
+
+
+# ----------------------------------------------------------------------
+# __main__ .... code section
+if __name__ == "__main__":
+    """Optionally...
+    : - print the script source name.
+    : - run the _demo
+    """
+#    print("Script... {}".format(script))
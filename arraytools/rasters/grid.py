@@ -77,6 +77,8 @@ def check_stack(arrs):
     """
     err1 = "Object, structured arrays not supported, current type..."
     err2 = "3D arrays supported current ndim..."
+    if hasattr(arrs, 'tiles'):  # a RasterStack
+        return arrs
     if isinstance(arrs, (list, tuple)):
         arrs = np.array(arrs)
     if arrs.dtype.kind in ('O', 'V'):
@@ -155,7 +157,18 @@ def combine_(*arrs, ret_classes=False):
 
 # ---- Statistics for stacked arrays (3D) ------------------------------------
 #
-def stack_percentile(arrs, q=50, nodata=None):
+def _streamed_(a, out=None, tile=None):
+    """True for a RasterStack (arraytools.stackstats) or a tiled request"""
+    return hasattr(a, 'tiles') or (out is not None) or (tile is not None)
+
+
+def _stack_tiled_(*args, **kwargs):
+    """see arraytools.stackstats._stack_tiled_"""
+    from arraytools.stackstats import _stack_tiled_ as tiled
+    return tiled(*args, **kwargs)
+
+
+def stack_percentile(arrs, q=50, nodata=None, out=None, tile=None):
     """nanpercentile for an array stack with optional nodata masked
 
     `arrs` : iterable
@@ -166,87 +179,109 @@ def stack_percentile(arrs, q=50, nodata=None):
         nodata value, numeric or np.nan (will upscale integers)
     """
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanpercentile, nodata, out, tile, q=q)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     nan_per = np.nanpercentile(a, q=q, axis=0)
     return nan_per
 
 
-def stack_sum(arrs, nodata=None):
-    """see stack_stats"""
+def stack_sum(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nansum, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nansum(a, axis=0)
 
 
-def stack_cumsum(arrs, nodata=None):
-    """see stack_stats"""
+def stack_cumsum(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nancumsum, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nancumsum(a, axis=0)
 
 
-def stack_prod(arrs, nodata=None):
-    """see stack_stats"""
+def stack_prod(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanprod, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanprod(a, axis=0)
 
 
-def stack_cumprod(arrs, nodata=None):
-    """see stack_stats"""
+def stack_cumprod(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nancumprod, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nancumprod(a, axis=0)
 
 
-def stack_min(arrs, nodata=None):
-    """see stack_stats"""
+def stack_min(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanmin, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanmin(a, axis=0)
 
 
-def stack_mean(arrs, nodata=None):
-    """see stack_stats"""
+def stack_mean(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanmean, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanmean(a, axis=0)
 
 
-def stack_median(arrs, nodata=None):
-    """see stack_stats"""
+def stack_median(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanmedian, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanmedian(a, axis=0)
 
 
-def stack_max(arrs, nodata=None):
-    """see stack_stats"""
+def stack_max(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanmax, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanmax(a, axis=0)
 
 
-def stack_std(arrs, nodata=None):
-    """see stack_stats"""
+def stack_std(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanstd, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanstd(a, axis=0)
 
 
-def stack_var(arrs, nodata=None):
-    """see stack_stats"""
+def stack_var(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanvar, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanvar(a, axis=0)
@@ -263,6 +298,9 @@ def stack_stats(arrs, ax=0, nodata=None):
         nodata value, numeric or np.nan (will upscale integers)
     """
     arrs = check_stack(arrs)
+    if hasattr(arrs, 'tiles'):  # a RasterStack, see arraytools.stackstats
+        from arraytools.stackstats import stack_stats as streamed
+        return streamed(arrs, ax=ax, nodata=nodata)
     a_m = mask_stack(arrs, nodata=nodata)
     nan_sum = np.nansum(a_m, axis=ax)
     nan_min = np.nanmin(a_m, axis=ax)
@@ -382,17 +420,13 @@ def reclass_vals(a, old_vals=[], new_vals=[], mask=False, mask_val=None):
              [ 5,  6,  7,  8,  9],          [2, 2, 2, 2, 2],
              [10, 11, 12, 13, 14]])         [3, 3, 3, 3, 3]])
     """
-    a_rc = np.copy(a)
+    from arraytools.tools import _reclass_vals_
     args = [old_vals, new_vals]
     msg = "\nError....\nLengths of old and new classes not equal \n{}\n{}\n"
     if len(old_vals) != len(new_vals):
         print(msg.format(*args))
         return a
-    old_new = np.array(list(zip(old_vals, new_vals)), dtype='int32')
-    for pair in old_new:
-        q = (a == pair[0])
-        a_rc[q] = pair[1]
-    return a_rc
+    return _reclass_vals_(a, old_vals, new_vals, mask_val if mask else None)
 
 
 # ----------------------------------------------------------------------
@@ -426,18 +460,13 @@ def reclass_ranges(a, bins=[], new_bins=[], mask=False, mask_val=None):
               [ 5,  6,  7,  8,  9],          [2, 2, 2, 2, 2],
               [10, 11, 12, 13, 14]])         [3, 3, 3, 3, 3]])
     """
-    a_rc = np.zeros_like(a)
+    from arraytools.tools import _reclass_bins_
     if (len(bins) < 2):  # or (len(new_bins <2)):
         print("Bins = {} new = {} won't work".format(bins, new_bins))
         return a
     if len(new_bins) < 2:
         new_bins = np.arange(1, len(bins)+2)
-    new_classes = list(zip(bins[:-1], bins[1:], new_bins))
-    for rc in new_classes:
-        q1 = (a >= rc[0])
-        q2 = (a < rc[1])
-        a_rc = a_rc + np.where(q1 & q2, rc[2], 0)
-    return a_rc
+    return _reclass_bins_(a, bins, new_bins, mask_val if mask else None)
 
 
 # (16) scale .... code section
@@ -64,6 +64,8 @@ def check_stack(arrs):
     """
     err1 = "Object, structured arrays not supported, current type..."
     err2 = "3D arrays supported current ndim..."
+    if hasattr(arrs, 'tiles'):  # a RasterStack
+        return arrs
     if isinstance(arrs, (list, tuple)):
         arrs = np.array(arrs)
     if arrs.dtype.kind in ('O', 'V'):
@@ -86,87 +88,118 @@ def mask_stack(arrs, nodata=None):
 
 # ---- Statistics for stacked arrays (3D) ------------------------------------
 #
-def stack_sum(arrs, nodata=None):
-    """see stack_stats"""
+def _streamed_(a, out=None, tile=None):
+    """True for a RasterStack (arraytools.stackstats) or a tiled request"""
+    return hasattr(a, 'tiles') or (out is not None) or (tile is not None)
+
+
+def _stack_tiled_(*args, **kwargs):
+    """see arraytools.stackstats._stack_tiled_"""
+    from arraytools.stackstats import _stack_tiled_ as tiled
+    return tiled(*args, **kwargs)
+
+
+def stack_sum(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nansum, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nansum(a, axis=0)
 
 
-def stack_cumsum(arrs, nodata=None):
-    """see stack_stats"""
+def stack_cumsum(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nancumsum, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nancumsum(a, axis=0)
 
 
-def stack_prod(arrs, nodata=None):
-    """see stack_stats"""
+def stack_prod(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanprod, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanprod(a, axis=0)
 
 
-def stack_cumprod(arrs, nodata=None):
-    """see stack_stats"""
+def stack_cumprod(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nancumprod, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nancumprod(a, axis=0)
 
 
-def stack_min(arrs, nodata=None):
-    """see stack_stats"""
+def stack_min(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanmin, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanmin(a, axis=0)
 
 
-def stack_mean(arrs, nodata=None):
-    """see stack_stats"""
+def stack_mean(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanmean, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanmean(a, axis=0)
 
 
-def stack_median(arrs, nodata=None):
-    """see stack_stats"""
+def stack_median(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanmedian, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanmedian(a, axis=0)
 
 
-def stack_max(arrs, nodata=None):
-    """see stack_stats"""
+def stack_max(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanmax, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanmax(a, axis=0)
 
 
-def stack_std(arrs, nodata=None):
-    """see stack_stats"""
+def stack_std(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanstd, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanstd(a, axis=0)
 
 
-def stack_var(arrs, nodata=None):
-    """see stack_stats"""
+def stack_var(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanvar, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanvar(a, axis=0)
 
 
-def stack_percentile(arrs, q=50, nodata=None):
+def stack_percentile(arrs, q=50, nodata=None, out=None, tile=None):
     """nanpercentile for an array stack with optional nodata masked
 
     -arrs :
@@ -177,6 +210,8 @@ def stack_percentile(arrs, q=50, nodata=None):
         nodata value, numeric or np.nan (will upscale integers)
     """
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanpercentile, nodata, out, tile, q=q)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     nan_per = np.nanpercentile(a, q=q, axis=0)
@@ -194,6 +229,9 @@ def stack_stats(arrs, ax=0, nodata=None):
         nodata value, numeric or np.nan (will upscale integers)
     """
     arrs = check_stack(arrs)
+    if hasattr(arrs, 'tiles'):  # a RasterStack, see arraytools.stackstats
+        from arraytools.stackstats import stack_stats as streamed
+        return streamed(arrs, ax=ax, nodata=nodata)
     a_m = mask_stack(arrs, nodata=nodata)
     nan_sum = np.nansum(a_m, axis=ax)
     nan_min = np.nanmin(a_m, axis=ax)
@@ -213,6 +251,9 @@ def stack_stats_tbl(arrs, nodata=None):  # col_names, args):
     """Produce the output table
     :   ('N_', '<i4'), ('N_nan', '<i4')
     """
+    if hasattr(arrs, 'tiles'):  # a RasterStack, see arraytools.stackstats
+        from arraytools.stackstats import stack_stats_tbl as streamed
+        return streamed(arrs, nodata=nodata)
     stats = stack_stats(arrs, ax=(1, 2), nodata=nodata)
     d = [(i, '<f8')
          for i in ['Sum', 'Min', 'Mean', 'Med', 'Max', 'Std', 'Var']]
@@ -0,0 +1,391 @@
+# -*- coding: UTF-8 -*-
+"""
+======
+sindex
+======
+
+Script :   sindex.py
+
+Author :   Dan_Patterson@carleton.ca
+
+Modified : 2019-02-25
+
+Purpose :  A spatial index for the extents of polygons and segments
+
+Notes
+-----
+The index is a Sort-Tile-Recursive (STR) packed R-tree held in a single
+structured array, so it can be saved and reloaded with the `_io` functions::
+
+    >>> tree = str_tree(poly_extents(polys))
+    >>> save_npy(tree, "c:/temp/polys_tree.npy")  # from _io
+    >>> tree = load_npy("c:/temp/polys_tree.npy")
+
+Each record is a node.  The leaves (level 0) come first, followed by each
+level up to the roots.  For a leaf, `first` is the index of the geometry in
+the original sequence.  For all other nodes, `first` and `last` are the slice
+of the tree holding its children.  Extents are `L, B, R, T` as returned by
+`geom_properties.extent_`.
+
+Queries descend the tree one level at a time for all query boxes at once,
+keeping (query, node) pairs whose extents overlap, so only the candidate
+geometries are returned for the exact (point in polygon, intersection) test.
+
+For points, `PointIndex` keeps a scipy cKDTree for repeated nearest neighbour
+and radius queries.  Build it once and pass it to `geom.knn`,
+`geom.nn_kdtree`, `geomtools.hulls.knn0` or `analysis.near.knn_chunks`::
+
+    >>> idx = PointIndex(pnts)
+    >>> d, i = idx.query(pnts[:10], k=3, workers=-1)
+    >>> idx.save("c:/temp/pnts_idx.npy")
+    >>> idx = PointIndex.load("c:/temp/pnts_idx.npy")  # memory-mapped points
+
+Included in this module::
+
+    'PointIndex', 'poly_extents', 'seg_extents', 'str_tree', 'tree_nearest',
+    'tree_query', 'tree_query_boxes', 'tree_query_pnts'
+
+References
+----------
+`<https://apps.dtic.mil/dtic/tr/fulltext/u2/a324493.pdf>`_.  STR packing
+
+`<https://en.wikipedia.org/wiki/R-tree>`_.
+
+"""
+# pylint: disable=C0103  # invalid-name
+# pylint: disable=R0914  # Too many local variables
+# pylint: disable=R1710  # inconsistent-return-statements
+# pylint: disable=W0105  # string statement has no effect
+
+# ---- imports, formats, constants ----
+import sys
+from textwrap import dedent
+import numpy as np
+from geom_properties import extent_
+
+ft = {'bool': lambda x: repr(x.astype(np.int32)),
+      'float_kind': '{: 0.3f}'.format}
+np.set_printoptions(edgeitems=10, linewidth=80, precision=2, suppress=True,
+                    threshold=100, formatter=ft)
+np.ma.masked_print_option.set_display('-')  # change to a single -
+
+script = sys.argv[0]  # print this should you need to locate the script
+
+tree_dt = [('L', '<f8'), ('B', '<f8'), ('R', '<f8'), ('T', '<f8'),
+           ('first', '<i8'), ('last', '<i8'), ('level', '<i4')]
+
+__all__ = ['PointIndex',                    # points
+           'poly_extents', 'seg_extents',   # extents
+           'str_tree',                      # build
+           'tree_query', 'tree_query_boxes',
+           'tree_query_pnts', 'tree_nearest'
+           ]
+
+
+# ---- extents ---------------------------------------------------------------
+#
+def poly_extents(polys):
+    """Return the L, B, R, T extents of a sequence of polygons or polylines
+    as an (N, 4) array, using `extent_` on each.  A polygon may also be given
+    as a list of rings, in which case the outer ring provides the extent.
+    """
+    ext = []
+    for p in polys:
+        if not isinstance(p, np.ndarray) or p.dtype.kind == 'O':
+            p = p[0]
+        ext.append(extent_(np.asarray(p)))
+    return np.asarray(ext, dtype=np.float64).reshape(-1, 4)
+
+
+def seg_extents(segs):
+    """Return the L, B, R, T extents of an (N, 2, 2) array of from-to
+    segments, such as those produced by `geom.poly2segments`.
+    """
+    segs = np.asarray(segs, dtype=np.float64).reshape(-1, 2, 2)
+    return np.concatenate((segs.min(axis=1), segs.max(axis=1)), axis=1)
+
+
+# ---- build -----------------------------------------------------------------
+#
+def _str_order_(boxes, node_size):
+    """Sort-Tile-Recursive order.  Sort by x center into vertical slices of
+    `S * node_size` boxes, then by y center within each slice.
+    """
+    N = len(boxes)
+    P = int(np.ceil(N / node_size))    # number of pages (nodes)
+    S = int(np.ceil(np.sqrt(P)))       # number of slices
+    cx = boxes[:, 0] + boxes[:, 2]
+    cy = boxes[:, 1] + boxes[:, 3]
+    ox = np.argsort(cx, kind='stable')
+    slab = np.arange(N) // (S * node_size)
+    return ox[np.lexsort((cy[ox], slab))]
+
+
+def str_tree(boxes, node_size=16):
+    """Bulk load an STR packed R-tree from extents.
+
+    Parameters
+    ----------
+    boxes : array
+        (N, 4) array of L, B, R, T extents.  See `poly_extents` and
+        `seg_extents`.
+    node_size : integer
+        The maximum number of children per node.
+
+    Returns
+    -------
+    A structured array of the nodes, see the module notes.
+
+    Example
+    -------
+    >>> boxes = np.array([[0, 0, 1, 1], [2, 2, 3, 3], [0, 2, 1, 3.]])
+    >>> tree = str_tree(boxes, node_size=2)
+    >>> tree_query(tree, [0.5, 0.5, 2.5, 2.5])
+    array([0, 1, 2])
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    node_size = max(2, int(node_size))
+    ids = np.arange(len(boxes))
+    first, last = ids, ids
+    levels = []
+    offset = 0
+    level = 0
+    while True:
+        order = _str_order_(boxes, node_size)
+        boxes, first, last = boxes[order], first[order], last[order]
+        N = len(boxes)
+        z = np.zeros((N,), dtype=tree_dt)
+        z['L'], z['B'], z['R'], z['T'] = boxes.T
+        z['first'], z['last'], z['level'] = first, last, level
+        levels.append(z)
+        if N <= node_size:
+            break
+        starts = np.arange(0, N, node_size)
+        boxes = np.stack((np.minimum.reduceat(boxes[:, 0], starts),
+                          np.minimum.reduceat(boxes[:, 1], starts),
+                          np.maximum.reduceat(boxes[:, 2], starts),
+                          np.maximum.reduceat(boxes[:, 3], starts)), axis=1)
+        first = offset + starts
+        last = offset + np.append(starts[1:], N)
+        offset += N
+        level += 1
+    return np.concatenate(levels)
+
+
+# ---- query -----------------------------------------------------------------
+#
+def _roots_(tree):
+    """The indices of the top level nodes, none for an empty tree"""
+    if len(tree) == 0:
+        return np.zeros((0,), np.intp)
+    return np.nonzero(tree['level'] == tree['level'][-1])[0]
+
+
+def _children_(tree, nodes):
+    """Expand nodes to their children.  Returns the position of the parent in
+    `nodes` and the child node index, one pair per child.
+    """
+    first = tree['first'][nodes]
+    cnt = tree['last'][nodes] - first
+    pos = np.repeat(np.arange(len(nodes)), cnt)
+    offs = np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+    return pos, np.repeat(first, cnt) + offs
+
+
+def tree_query_boxes(tree, boxes, chunk=100000):
+    """Query the tree with many boxes at once.
+
+    Parameters
+    ----------
+    tree : array
+        The tree produced by `str_tree`
+    boxes : array
+        (N, 4) array of L, B, R, T query extents
+    chunk : integer
+        The number of query boxes processed at a time.
+
+    Returns
+    -------
+    Two integer arrays of equal length, the query box index and the index of
+    a geometry whose extent overlaps it.  Touching extents overlap.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    roots = _roots_(tree)
+    q_out, g_out = [], []
+    for i in range(0, len(boxes), chunk):
+        b = boxes[i:i + chunk]
+        q = np.repeat(np.arange(len(b)), len(roots))
+        n = np.tile(roots, len(b))
+        while True:
+            t = tree[n]
+            bq = b[q]
+            keep = ((bq[:, 0] <= t['R']) & (bq[:, 2] >= t['L']) &
+                    (bq[:, 1] <= t['T']) & (bq[:, 3] >= t['B']))
+            q, n = q[keep], n[keep]
+            if n.size == 0 or tree['level'][n[0]] == 0:
+                break
+            pos, n = _children_(tree, n)
+            q = q[pos]
+        q_out.append(q + i)
+        g_out.append(tree['first'][n])
+    if not q_out:
+        return np.zeros((0,), np.int64), np.zeros((0,), np.int64)
+    return np.concatenate(q_out), np.concatenate(g_out)
+
+
+def tree_query(tree, box):
+    """Return the sorted indices of the geometries whose extent overlaps
+    `box`, given as L, B, R, T.
+    """
+    _, g = tree_query_boxes(tree, box)
+    return np.sort(g)
+
+
+def tree_query_pnts(tree, pnts, chunk=100000):
+    """Query the tree with points.  Returns the point index and the index of
+    a geometry whose extent contains it, as in `tree_query_boxes`.
+    """
+    pnts = np.atleast_2d(np.asarray(pnts, dtype=np.float64))
+    return tree_query_boxes(tree, np.concatenate((pnts, pnts), axis=1),
+                            chunk=chunk)
+
+
+def tree_nearest(tree, pnt):
+    """Return the index of the geometry with the nearest extent to a point,
+    and the distance to that extent (0 if the point is within it).  An
+    empty tree returns -1 and inf.
+
+    Notes
+    -----
+    Each node contains at least one extent, so the distance to the farthest
+    corner of a node is an upper bound for the nearest distance.  Nodes whose
+    nearest distance exceeds the smallest upper bound are pruned at each
+    level.
+    """
+    x, y = np.asarray(pnt, dtype=np.float64)
+    n = _roots_(tree)
+    if n.size == 0:
+        return -1, np.inf
+    while True:
+        t = tree[n]
+        dx = np.maximum(np.maximum(t['L'] - x, x - t['R']), 0.)
+        dy = np.maximum(np.maximum(t['B'] - y, y - t['T']), 0.)
+        d_min = np.hypot(dx, dy)
+        if t['level'][0] == 0:
+            k = np.argmin(d_min)
+            return t['first'][k], d_min[k]
+        d_max = np.hypot(np.maximum(np.abs(x - t['L']), np.abs(x - t['R'])),
+                         np.maximum(np.abs(y - t['B']), np.abs(y - t['T'])))
+        n = n[d_min <= d_max.min()]
+        _, n = _children_(tree, n)
+
+
+# ---- point index -----------------------------------------------------------
+#
+class PointIndex(object):
+    """A KD-tree for a fixed set of points, built once and queried many times.
+
+    Parameters
+    ----------
+    pnts : array
+        An (N, 2) array of point coordinates.
+    leafsize : integer
+        Passed on to scipy.spatial.cKDTree.
+
+    Attributes
+    ----------
+    data : array
+        The point coordinates, as float64.  Possibly a read-only `np.memmap`
+        when loaded with `PointIndex.load`.
+    tree : cKDTree
+        The tree.  `data` and `query` mirror the cKDTree so that either can
+        be passed to functions accepting an index.
+
+    Notes
+    -----
+    The object pickles with its tree, so unpickling does not rebuild it.
+    `save` and `load` keep only the points in a `.npy` file.  `load` memory
+    maps them and builds the tree over the mapped array without copying the
+    coordinates.
+    """
+
+    def __init__(self, pnts, leafsize=16):
+        from scipy.spatial import cKDTree
+        pnts = np.asanyarray(pnts)
+        if pnts.dtype != np.float64 or not pnts.flags.c_contiguous:
+            pnts = np.ascontiguousarray(pnts, dtype=np.float64)
+        self.data = pnts
+        self.leafsize = leafsize
+        self.tree = cKDTree(pnts, leafsize=leafsize, copy_data=False)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return "PointIndex({:,} points)".format(len(self.data))
+
+    def query(self, pnts, k=1, workers=1, **kwargs):
+        """Distances and indices of the `k` nearest points to each of `pnts`,
+        as returned by cKDTree.query.  Use `workers=-1` to use all cores.
+        """
+        return self.tree.query(pnts, k=k, workers=workers, **kwargs)
+
+    def query_radius(self, pnts, r, workers=1, return_sorted=True):
+        """Indices of the points within distance `r` of each of `pnts`.  A
+        list for a single point, otherwise an object array of lists.
+        """
+        return self.tree.query_ball_point(pnts, r, workers=workers,
+                                          return_sorted=return_sorted)
+
+    def query_chunks(self, pnts, k=1, chunk=100000, workers=1):
+        """Yield `start, dist, idx` for `pnts` in chunks of `chunk` points,
+        so large batches of query points are processed in bounded memory.
+        """
+        pnts = np.asarray(pnts)
+        for s in range(0, len(pnts), chunk):
+            d, i = self.tree.query(pnts[s:s + chunk], k=k, workers=workers)
+            yield s, d, i
+
+    def save(self, f_name):
+        """Save the points to a `.npy` file.  See `load`."""
+        np.save(f_name, self.data)
+
+    @classmethod
+    def load(cls, f_name, mmap_mode='r', leafsize=16):
+        """Load the points saved by `save`, memory-mapped by default, and
+        build the index.
+        """
+        return cls(np.load(f_name, mmap_mode=mmap_mode), leafsize=leafsize)
+
+
+# ---- demo ------------------------------------------------------------------
+#
+def _demo(N=10000, node_size=16):
+    """Index `N` random squares and query them against a brute force scan.
+    """
+    xy = np.random.uniform(0., 1000., size=(N, 2))
+    boxes = np.concatenate((xy, xy + np.random.uniform(1., 10., (N, 2))),
+                           axis=1)
+    tree = str_tree(boxes, node_size=node_size)
+    box = np.array([400., 400., 450., 450.])
+    idx = tree_query(tree, box)
+    chk = np.nonzero((boxes[:, 0] <= box[2]) & (boxes[:, 2] >= box[0]) &
+                     (boxes[:, 1] <= box[3]) & (boxes[:, 3] >= box[1]))[0]
+    near, dist = tree_nearest(tree, [-10., -10.])
+    frmt = """
+    STR tree ... {:,} extents, {:,} nodes, node size {}
+    box query .. {} candidates, brute force {}, equal {}
+    nearest to (-10, -10) ... extent {}, distance {:0.3f}
+    """
+    args = [N, len(tree), node_size, len(idx), len(chk),
+            np.array_equal(idx, chk), near, dist]
+    print(dedent(frmt).format(*args))
+    return tree, boxes
+
+
+# ----------------------------------------------------------------------
+# __main__ .... code section
+if __name__ == "__main__":
+    # print the script source name.
+    print("Script... {}".format(script))
+#    tree, boxes = _demo()
@@ -14,6 +14,13 @@ Purpose:  tools for working with numpy arrays
 Requires:
 ---------
     arraytools.tools - nd2struct, stride
+    arraytools._io - load_npy, save_npy
+
+Notes:
+------
+Stacks too large for memory can be kept as a folder of `.npy` files, one per
+band, and opened as a `RasterStack`.  The stack_* functions read it a tile
+of rows at a time and can write to a memory mapped output, `out`.
 
 References:
 -----------
@@ -28,7 +35,11 @@ statistics-made-easy-raster-data-over-time>`_.
 
 # ---- imports, formats, constants ----
 import sys
+import os
+import warnings
+from glob import glob
 import numpy as np
+from arraytools._io import load_npy, save_npy
 
 ft = {'bool': lambda x: repr(x.astype(np.int32)),
       'float_kind': '{: 0.3f}'.format}
@@ -38,7 +49,8 @@ np.ma.masked_print_option.set_display('-')  # change to a single -
 
 script = sys.argv[0]  # print this should you need to locate the script
 
-__all__ = ['check_shapes', 'check_stack', 'mask_stack',
+__all__ = ['RasterStack',
+           'check_shapes', 'check_stack', 'mask_stack',
            'stack_sum', 'stack_cumsum',  # statistical functions
            'stack_prod', 'stack_cumprod',
            'stack_min', 'stack_mean',
@@ -49,6 +61,94 @@ __all__ = ['check_shapes', 'check_stack', 'mask_stack',
            'stack_stats_tbl']
 
 
+# ---- RasterStack ----------------------------------------------------------
+#
+class RasterStack(object):
+    """A 3D stack (bands, rows, cols) kept on disk as one `.npy` file per
+    band.  The bands are opened as read-only memory maps, so only the slices
+    that are asked for are read.
+
+    Parameters
+    ----------
+    path : text
+        Folder containing the band files.  They are sorted by name.
+    pattern : text
+        File name pattern for the bands.
+    mem_mb : number
+        Memory budget, in megabytes, used by `tile_rows` to size the tiles.
+
+    Notes
+    -----
+    Indexing follows arrays, `stack[i]` is band i, `stack[:, r0:r1]` is a
+    (bands, rows, cols) array of rows r0 to r1.
+
+    >>> RasterStack.save(arrs, folder)          # write the bands
+    >>> stack = RasterStack(folder, mem_mb=512)
+    >>> stack_mean(stack, nodata=-1, out=folder + '/mean.npy')
+    """
+
+    def __init__(self, path, pattern="*.npy", mem_mb=256):
+        self.path = path
+        self.files = sorted(glob(os.path.join(path, pattern)))
+        if not self.files:
+            raise ValueError("No {} files in {}".format(pattern, path))
+        self.bands = [load_npy(f, mmap_mode='r') for f in self.files]
+        check_shapes(self.bands)
+        if self.bands[0].ndim != 2:
+            raise ValueError("The bands need to be 2D arrays")
+        self.dtype = np.result_type(*self.bands)
+        self.shape = (len(self.bands),) + self.bands[0].shape
+        self.ndim = 3
+        self.mem_mb = mem_mb
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        frmt = "RasterStack: {} bands, shape {}, dtype {}\n  path: {}"
+        return frmt.format(self.shape[0], self.shape, self.dtype, self.path)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        b_key, rest = key[0], key[1:]
+        if isinstance(b_key, (int, np.integer)):
+            return np.asarray(self.bands[b_key][rest])
+        idx = range(self.shape[0])[b_key]
+        return np.stack([self.bands[i][rest] for i in idx])
+
+    def tile_rows(self, itemsize=8, copies=4):
+        """Rows per tile so that `copies` working copies of a tile, with
+        `itemsize` bytes per value, stay within `mem_mb`.
+        """
+        B, R, C = self.shape
+        n = int(self.mem_mb * 2**20) // (B * C * itemsize * copies)
+        return int(min(max(n, 1), R))
+
+    def tiles(self, tile=None):
+        """Yield (r0, r1, block), the rows and the (bands, rows, cols) data
+        of each tile.  `tile` rows, or `tile_rows()` if None.
+        """
+        tile = self.tile_rows() if tile is None else tile
+        R = self.shape[1]
+        for r0 in range(0, R, tile):
+            r1 = min(r0 + tile, R)
+            yield r0, r1, self[:, r0:r1]
+
+    @classmethod
+    def save(cls, arrs, path, prefix="band", mem_mb=256):
+        """Save the bands of `arrs`, a 3D array or a sequence of 2D arrays,
+        to `path` and return the RasterStack.
+        """
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        w = max(len(str(len(arrs) - 1)), 3)
+        for i, a in enumerate(arrs):
+            f = os.path.join(path, "{}_{:0{}d}.npy".format(prefix, i, w))
+            save_npy(np.asarray(a), f)
+        return cls(path, pattern="{}_*.npy".format(prefix), mem_mb=mem_mb)
+
+
 # ---- array checks and creation --------------------------------------------
 # ---- 3D arrays for stacked operations
 #
@@ -68,6 +168,8 @@ def check_stack(arrs):
     """
     err1 = "Object, structured arrays not supported, current type..."
     err2 = "3D arrays supported current ndim..."
+    if isinstance(arrs, RasterStack):
+        return arrs
     if isinstance(arrs, (list, tuple)):
         arrs = np.array(arrs)
     if arrs.dtype.kind in ('O', 'V'):
@@ -91,87 +193,107 @@ def mask_stack(arrs, nodata=None):
 
 # ---- Statistics for stacked arrays (3D) ------------------------------------
 #
-def stack_sum(arrs, nodata=None):
-    """see stack_stats"""
+def stack_sum(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nansum, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nansum(a, axis=0)
 
 
-def stack_cumsum(arrs, nodata=None):
-    """see stack_stats"""
+def stack_cumsum(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nancumsum, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nancumsum(a, axis=0)
 
 
-def stack_prod(arrs, nodata=None):
-    """see stack_stats"""
+def stack_prod(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanprod, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanprod(a, axis=0)
 
 
-def stack_cumprod(arrs, nodata=None):
-    """see stack_stats"""
+def stack_cumprod(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nancumprod, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nancumprod(a, axis=0)
 
 
-def stack_min(arrs, nodata=None):
-    """see stack_stats"""
+def stack_min(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanmin, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanmin(a, axis=0)
 
 
-def stack_mean(arrs, nodata=None):
-    """see stack_stats"""
+def stack_mean(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanmean, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanmean(a, axis=0)
 
 
-def stack_median(arrs, nodata=None):
-    """see stack_stats"""
+def stack_median(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanmedian, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanmedian(a, axis=0)
 
 
-def stack_max(arrs, nodata=None):
-    """see stack_stats"""
+def stack_max(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanmax, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanmax(a, axis=0)
 
 
-def stack_std(arrs, nodata=None):
-    """see stack_stats"""
+def stack_std(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanstd, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanstd(a, axis=0)
 
 
-def stack_var(arrs, nodata=None):
-    """see stack_stats"""
+def stack_var(arrs, nodata=None, out=None, tile=None):
+    """see stack_stats, and `_stack_tiled_` for `out` and `tile`"""
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanvar, nodata, out, tile)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     return np.nanvar(a, axis=0)
 
 
-def stack_percentile(arrs, q=50, nodata=None):
+def stack_percentile(arrs, q=50, nodata=None, out=None, tile=None):
     """nanpercentile for an array stack with optional nodata masked
 
     -arrs :
@@ -180,15 +302,94 @@ def stack_percentile(arrs, q=50, nodata=None):
         the percentile
     - nodata :
         nodata value, numeric or np.nan (will upscale integers)
+    - out, tile :
+        see `_stack_tiled_`
     """
     a = check_stack(arrs)
+    if _streamed_(a, out, tile):
+        return _stack_tiled_(a, np.nanpercentile, nodata, out, tile, q=q)
     if nodata is not None:
         a = mask_stack(a, nodata=nodata)
     nan_per = np.nanpercentile(a, q=q, axis=0)
     return nan_per
 
 
-def stack_stats(arrs, ax=0, nodata=None):
+def _streamed_(a, out=None, tile=None):
+    """True if the stack should be processed by tile, see `_stack_tiled_`"""
+    if isinstance(a, RasterStack):
+        return True
+    return (out is not None) or (tile is not None)
+
+
+def _stack_tiled_(a, func, nodata=None, out=None, tile=None, **kwargs):
+    """Apply a nan-function through the bands, a tile of rows at a time.
+
+    Parameters
+    ----------
+    a : array or RasterStack
+        The 3D stack.
+    func : function
+        np.nansum, np.nanmean etc., called with axis=0 on each tile.
+    nodata : number
+        Cells with nodata in any band are set to np.nan.
+    out : array or text
+        An array, np.memmap for example, or the name of a `.npy` file to
+        create as a memmap.  None, returns an array in memory.
+    tile : integer
+        Rows per tile.  None uses `RasterStack.tile_rows` or about 2**20
+        values for arrays.
+
+    Notes
+    -----
+    Unlike the masked array versions, the results are plain float64 arrays
+    with np.nan where there is no data.
+    """
+    B, R, C = a.shape
+    if tile is None:
+        if isinstance(a, RasterStack):
+            tile = a.tile_rows()
+        else:
+            tile = max(1, 2**20 // max(B * C, 1))
+    for r0 in range(0, R, tile):
+        r1 = min(r0 + tile, R)
+        b = np.asarray(a[:, r0:r1], dtype=np.float64)
+        bad = None
+        if nodata is not None:
+            bad = (b == nodata).any(axis=0)
+            b[:, bad] = np.nan
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            res = func(b, axis=0, **kwargs)
+        if bad is not None:
+            res[..., bad] = np.nan
+        if r0 == 0:
+            shp = res.shape[:-2] + (R, C)
+            if out is None:
+                out = np.empty(shp, dtype=np.float64)
+            elif isinstance(out, str):
+                out = np.lib.format.open_memmap(out, mode='w+',
+                                                dtype=np.float64, shape=shp)
+            elif out.shape != shp:
+                raise ValueError("`out` needs shape {}".format(shp))
+        out[..., r0:r1, :] = res
+    return out
+
+
+def _alloc_(shape, fill, out_dir=None, name=None):
+    """A float64 array filled with `fill`, or a `.npy` memmap named `name` in
+    `out_dir`, for `_stack_reduce_`.
+    """
+    if out_dir is None:
+        return np.full(shape, fill, dtype=np.float64)
+    f = os.path.join(out_dir, name + ".npy")
+    z = np.lib.format.open_memmap(f, mode='w+', dtype=np.float64,
+                                  shape=shape)
+    z[...] = fill
+    return z
+
+
+def stack_stats(arrs, ax=0, nodata=None, median=True, q=None, tile=None,
+                out_dir=None, cumsum=None):
     """All statistics for arrs.
 
     - arrs :
@@ -196,22 +397,211 @@ def stack_stats(arrs, ax=0, nodata=None):
     - ax :
         axis, either, 0 (by band) or (1,2) to get a single value for each band
     - nodata :
-        nodata value, numeric or np.nan (will upscale integers)
+        nodata value, numeric or np.nan (will upscale integers).  A cell with
+        nodata in any band is excluded from every band, as in `mask_stack`.
+    - median :
+        False, skip the median, its slot is filled with np.nan
+    - q :
+        optional percentile(s), appended to the end of the results
+    - tile :
+        rows per tile, None to size the tiles to about 2**16 values
+    - out_dir :
+        folder for the ax=0 results, written as `.npy` memmaps (sum.npy,
+        min.npy ...), for stacks whose results don't fit in memory
+    - cumsum :
+        ax=0 only, also return the cumulative sum, which is as large as the
+        stack.  None, True for arrays in memory and False for a RasterStack
+        or a memmap.  True for those requires `out_dir`.
+
+    Returns a list of [sum, min, mean, median, max, std, var], plus cumsum if
+    requested and the percentiles if `q` is given.  Cells without data are
+    np.nan.  See `_stack_reduce_`.
     """
     arrs = check_stack(arrs)
-    a_m = mask_stack(arrs, nodata=nodata)
-    nan_sum = np.nansum(a_m, axis=ax)
-    nan_min = np.nanmin(a_m, axis=ax)
-    nan_mean = np.nanmean(a_m, axis=ax)
-    nan_median = np.nanmean(a_m, axis=ax)
-    nan_max = np.nanmax(a_m, axis=ax)
-    nan_std = np.nanstd(a_m, axis=ax)
-    nan_var = np.nanvar(a_m, axis=ax)
-    stats = [nan_sum, nan_min, nan_mean, nan_median, nan_max, nan_std, nan_var]
+    on_disk = isinstance(arrs, (RasterStack, np.memmap))
+    cumsum = np.isscalar(ax) and (not on_disk if cumsum is None else cumsum)
+    if cumsum and on_disk and out_dir is None:
+        raise ValueError("cumsum of a RasterStack or memmap needs `out_dir`")
+    r = _stack_reduce_(arrs, ax=ax, nodata=nodata, median=median, q=q,
+                       cumsum=cumsum, tile=tile, out_dir=out_dir)
+    keys = ['sum', 'min', 'mean', 'median', 'max', 'std', 'var']
+    if cumsum:
+        keys.append('cumsum')
+    if q is not None:
+        keys.append('q')
+    return [r[k] for k in keys]
+
+
+def _stack_reduce_(a, ax=0, nodata=None, median=True, q=None, cumsum=False,
+                   tile=None, out_dir=None):
+    """Fused statistics for a 3D stack, one pass over each tile of rows.
+
+    Every tile, (bands, rows, cols), is read once as float64 and reduced
+    while it is still in cache.  Tiles without NaN skip the per value
+    masking, cells with nodata are simply dropped.  The per band results of
+    ax=(1, 2) are merged across the tiles with the pairwise form of Welford's
+    update, so the variance stays stable for long runs.  Returns a dictionary
+    of results, including `count` and `n_nodata` (nodata values per band).
+    The ax=0 results are memmaps in `out_dir` if it is given.
+    """
+    B, R, C = a.shape
     if np.isscalar(ax):
-        nan_cumsum = np.nancumsum(a_m, axis=ax)
-        stats.append(nan_cumsum)
-    return stats
+        if ax != 0:
+            raise ValueError("ax needs to be 0 or (1, 2)")
+        by_cell = True
+    elif tuple(ax) == (1, 2):
+        by_cell = False
+    else:
+        raise ValueError("ax needs to be 0 or (1, 2)")
+    if tile is None:
+        tile = max(1, 2**16 // max(B * C, 1))
+    shp = (R, C) if by_cell else (B,)
+    if not by_cell:
+        out_dir = None
+    n = _alloc_(shp, 0., out_dir, 'count')
+    s = _alloc_(shp, 0., out_dir, 'sum')
+    mn = _alloc_(shp, np.inf, out_dir, 'min')
+    mx = _alloc_(shp, -np.inf, out_dir, 'max')
+    mean = _alloc_(shp, 0., out_dir, 'mean')
+    m2 = _alloc_(shp, 0., out_dir, 'var')
+    n_nodata = np.zeros(B, dtype=np.int64)
+    cell_bad = np.zeros((R, C), dtype=bool)
+    cs = _alloc_(a.shape, 0., out_dir, 'cumsum') if cumsum else None
+    pct = [50.] if median else []
+    if q is not None:
+        pct.extend(np.atleast_1d(q).tolist())
+    qs = None
+    if pct:
+        qs = _alloc_((len(pct),) + shp, np.nan, out_dir, 'percentiles')
+    is_flt = a.dtype.kind == 'f'
+    for r0 in range(0, R, tile):
+        r1 = min(r0 + tile, R)
+        b = np.asarray(a[:, r0:r1], dtype=np.float64)
+        bad = np.zeros(b.shape[1:], dtype=bool)
+        if nodata is not None:
+            nd_ = b == nodata
+            n_nodata += nd_.sum(axis=(1, 2))
+            bad = nd_.any(axis=0)
+            cell_bad[r0:r1] = bad
+        nan_ = np.isnan(b) if is_flt else None
+        if nan_ is not None and not nan_.any():
+            nan_ = None
+        if by_cell:
+            t = _cell_stats_(b, bad, nan_, pct, cumsum)
+            sl = (slice(r0, r1), slice(None))
+            n[sl], s[sl], mean[sl], m2[sl], mn[sl], mx[sl] = t[:6]
+            if pct:
+                qs[(slice(None),) + sl] = t[6]
+            if cumsum:
+                cs[:, r0:r1] = t[7]
+            continue
+        if bad.any():
+            x = b[:, ~bad]
+            nan_ = None if nan_ is None else nan_[:, ~bad]
+        else:
+            x = b.reshape(B, -1)
+            nan_ = None if nan_ is None else nan_.reshape(B, -1)
+        if nan_ is None:
+            cnt = np.full(B, x.shape[1], dtype=np.float64)
+            t_s = x.sum(axis=1)
+            t_mn = x.min(axis=1, initial=np.inf)
+            t_mx = x.max(axis=1, initial=-np.inf)
+        else:
+            v = ~nan_
+            cnt = v.sum(axis=1).astype(np.float64)
+            x = np.where(v, x, 0.)
+            t_s = x.sum(axis=1)
+            t_mn = np.where(v, x, np.inf).min(axis=1, initial=np.inf)
+            t_mx = np.where(v, x, -np.inf).max(axis=1, initial=-np.inf)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t_mean = np.where(cnt > 0, t_s / cnt, 0.)
+        dev = x - t_mean[:, None]
+        if nan_ is not None:
+            dev[nan_] = 0.
+        t_m2 = np.einsum('ij,ij->i', dev, dev)
+        n_ = n + cnt
+        delta = t_mean - mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            f = np.where(n_ > 0, cnt / n_, 0.)
+        mean = mean + delta * f
+        m2 = m2 + t_m2 + delta * delta * n * f
+        n = n_
+        s += t_s
+        mn = np.minimum(mn, t_mn)
+        mx = np.maximum(mx, t_mx)
+    if pct and not by_cell:
+        for i in range(B):
+            bn = np.asarray(a[i], dtype=np.float64)
+            bn = bn[~(cell_bad | np.isnan(bn))]
+            if bn.size:
+                qs[:, i] = np.percentile(bn, pct)
+    empty = n == 0
+    var = m2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        np.divide(m2, n, out=var)
+    std = _alloc_(shp, 0., out_dir, 'std')
+    np.sqrt(var, out=std)
+    out = {'count': n, 'n_nodata': n_nodata,
+           'sum': s, 'min': mn, 'mean': mean, 'max': mx,
+           'var': var, 'std': std}
+    for k in ('sum', 'min', 'mean', 'max'):
+        out[k][empty] = np.nan
+    out['median'] = qs[0] if median else _alloc_(shp, np.nan)
+    if q is not None:
+        out['q'] = qs[int(median):]
+    out['cumsum'] = cs
+    return out
+
+
+def _cell_stats_(b, bad, nan_, pct, cumsum):
+    """Statistics through the bands of a tile, `b`, for `_stack_reduce_`.
+
+    `bad` flags the nodata cells, `nan_` the NaN values, or None if there
+    are none.  Returns count, sum, mean, m2, min, max, the percentiles `pct`
+    and the cumulative sum.
+    """
+    B = b.shape[0]
+    if nan_ is None:
+        cnt = np.full(b.shape[1:], B, dtype=np.float64)
+        x = b
+    else:
+        cnt = B - nan_.sum(axis=0).astype(np.float64)
+        x = np.where(nan_, 0., b)
+    cnt[bad] = 0.
+    t_s = x.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_mean = np.where(cnt > 0, t_s / cnt, 0.)
+    dev = x - t_mean
+    if nan_ is not None:
+        dev[nan_] = 0.
+    t_m2 = np.einsum('ijk,ijk->jk', dev, dev)
+    if nan_ is None:
+        t_mn, t_mx = b.min(axis=0), b.max(axis=0)
+    else:
+        t_mn = np.fmin.reduce(b, axis=0)
+        t_mx = np.fmax.reduce(b, axis=0)
+    t_s[bad] = 0.
+    t_mean[bad] = 0.
+    t_m2[bad] = 0.
+    t_mn[bad] = np.inf
+    t_mx[bad] = -np.inf
+    qs = c_ = None
+    if pct:
+        srt = np.sort(b, axis=0)  # NaN sort to the end
+        qs = np.empty((len(pct),) + b.shape[1:])
+        k = cnt.astype(np.intp)
+        for i, p in enumerate(pct):
+            pos = np.maximum(k - 1, 0) * (p / 100.)
+            lo = np.floor(pos).astype(np.intp)
+            hi = np.minimum(lo + 1, np.maximum(k - 1, 0))
+            v_lo = np.take_along_axis(srt, lo[None], axis=0)[0]
+            v_hi = np.take_along_axis(srt, hi[None], axis=0)[0]
+            qs[i] = v_lo + (v_hi - v_lo) * (pos - lo)
+        qs[:, k == 0] = np.nan
+    if cumsum:
+        c_ = np.cumsum(x, axis=0)
+        c_[:, cnt == 0] = np.nan
+    return cnt, t_s, t_mean, t_m2, t_mn, t_mx, qs, c_
 
 
 def stack_stats_tbl(arrs, nodata=None):  # col_names, args):
@@ -224,21 +614,55 @@ def stack_stats_tbl(arrs, nodata=None):  # col_names, args):
            ('Min', '<f8'), ('Mean', '<f8'), ('Med', '<f8'), ('Max', '<f8'),
            ('Std', '<f8'), ('Var', '<f8')])
     """
-    stats = stack_stats(arrs, ax=(1, 2), nodata=nodata)
+    arrs = check_stack(arrs)
+    r = _stack_reduce_(arrs, ax=(1, 2), nodata=nodata)
     d = [(i, '<f8')
          for i in ['Sum', 'Min', 'Mean', 'Med', 'Max', 'Std', 'Var']]
     dts = [('Band', '<i4'), ('N', '<i4'), ('N_nan', '<i4')] + d
-    N, r, c = arrs.shape
-    cols = len(dts)
+    N, r_, c_ = arrs.shape
+    keys = ['sum', 'min', 'mean', 'median', 'max', 'std', 'var']
     z = np.empty(shape=(N,), dtype=dts)
     z[z.dtype.names[0]] = np.arange(0, N)
-    z[z.dtype.names[1]] = np.array([r*c]*N)
-    z[z.dtype.names[2]] = np.count_nonzero(arrs == nodata, axis=(1, 2))
-    for i in range(cols-3):
-        z[z.dtype.names[i+3]] = stats[i]
+    z[z.dtype.names[1]] = np.array([r_*c_]*N)
+    z[z.dtype.names[2]] = r['n_nodata']
+    for i, k in enumerate(keys):
+        z[z.dtype.names[i+3]] = r[k]
     return z
 
 
+def _stack_stats_ma_(arrs, ax=0, nodata=None, median=True):
+    """The masked array version of `stack_stats`, one nan-function pass per
+    statistic.  Kept for `_bench_stats`.
+    """
+    arrs = check_stack(arrs)
+    a_m = mask_stack(arrs, nodata=nodata)
+    nan_sum = np.nansum(a_m, axis=ax)
+    nan_min = np.nanmin(a_m, axis=ax)
+    nan_mean = np.nanmean(a_m, axis=ax)
+    nan_median = np.nanmedian(a_m, axis=ax) if median else None
+    nan_max = np.nanmax(a_m, axis=ax)
+    nan_std = np.nanstd(a_m, axis=ax)
+    nan_var = np.nanvar(a_m, axis=ax)
+    return [nan_sum, nan_min, nan_mean, nan_median, nan_max, nan_std, nan_var]
+
+
+def _bench_stats(shape=(31, 1000, 1000), nodata=-1):
+    """Time the fused `stack_stats` against the masked array version."""
+    import time
+    a = np.random.RandomState(1).randint(0, 100, size=shape).astype('f8')
+    a[:, ::17, ::13] = nodata
+    frmt = "{:<6} median {!s:<5} masked {:7.3f} s  fused {:7.3f} s  {:5.1f}x"
+    for ax in (0, (1, 2)):
+        for med in (False, True):
+            t0 = time.perf_counter()
+            _stack_stats_ma_(a, ax=ax, nodata=nodata, median=med)
+            t1 = time.perf_counter()
+            stack_stats(a, ax=ax, nodata=nodata, median=med)
+            t2 = time.perf_counter()
+            print(frmt.format(str(ax), med, t1 - t0, t2 - t1,
+                              (t1 - t0) / (t2 - t1)))
+
+
 def _demo_stack():
     """
     demo stack :
@@ -7,7 +7,7 @@ Script :   cross_tab.py
 
 Author :   Dan.Patterson@carleton.ca
 
-Modified : 2018-03-19
+Modified : 2019-02-16
 
 Purpose :  Crosstabulate data
 
@@ -32,6 +32,7 @@ import sys
 import numpy as np
 import arcpy
 from textwrap import indent
+from arraytools.tbl import _factorize_
 
 ft = {'bool': lambda x: repr(x.astype('int32')),
       'float': '{: 0.3f}'.format}
@@ -53,8 +54,9 @@ def tweet(msg):
 
 
 def crosstab(row, col, verbose=False):
-    """Crosstabulate 2 data arrays, shape (N,), using np.unique.
-    scipy.sparse has similar functionality and is faster for large arrays.
+    """Crosstabulate 2 data arrays, shape (N,), using `tbl._factorize_`.
+    Each array is factorized once with np.unique and the counts are a
+    bincount of the combined codes, so large arrays are fine.
 
     Requires:
     --------
@@ -105,21 +107,16 @@ def crosstab(row, col, verbose=False):
         result = "\n".join(txt2)
         return result
 
-    dt = np.dtype([('row', row.dtype), ('col', col.dtype)])
-    rc = np.asarray(list(zip(row, col)), dtype=dt)
-    r = np.unique(row)
-    c = np.unique(col)
-    u, idx, inv, cnt = np.unique(rc, return_index=True, return_inverse=True,
-                                 return_counts=True)
-    rcc_dt = u.dtype.descr
-    rcc_dt.append(('Count', '<i4'))
-    ctab = np.asarray(list(zip(u['row'], u['col'], cnt)), dtype=rcc_dt)
+    row = np.asarray(row)
+    col = np.asarray(col)
+    (r, c), (rr, cc), _, cnt = _factorize_([row, col])
+    rcc_dt = [('row', row.dtype), ('col', col.dtype), ('Count', '<i4')]
+    ctab = np.empty(len(cnt), dtype=rcc_dt)
+    ctab['row'] = r[rr]
+    ctab['col'] = c[cc]
+    ctab['Count'] = cnt
     a = np.zeros((len(r), len(c)), dtype=np.int_)
-    rc = [[(np.where(r == i[0])[0]).item(),
-           (np.where(c == i[1])[0]).item()] for i in ctab]
-    for i in range(len(ctab)):
-        rr, cc = rc[i]
-        a[rr, cc] = ctab[i][2]
+    a[rr, cc] = cnt
     result = _prn(r, c, a)
     if verbose:
         tweet(result)
@@ -347,6 +347,8 @@ __all__ = ['pad_a',
            'kernels',
            'stride',
            'filter_a',
+           'surface_tiles',
+           'terrain',
            'slope_a',
            'aspect_a',
            'hillshade_a']
@@ -357,6 +359,8 @@ all_f = np.array([[1, 1, 1], [1, 1, 1], [1, 1, 1]])
 no_cnt = np.array([[1, 1, 1], [1, np.nan, 1], [1, 1, 1]])
 cross_f = np.array([[1, 0, 1], [0, 0, 0], [1, 0, 1]])
 plus_f = np.array([[0, 1, 0], [1, 0, 1], [0, 1, 0]])
+terrain_outputs = ['slope', 'aspect', 'hillshade', 'profile', 'plan',
+                   'curvature', 'tri', 'tpi']
 
 
 # ---- functions ----
@@ -410,10 +414,370 @@ def filter_a(a_s, a_filter=surface_kernel, cell_size=1):
     return dz_dx, dz_dy
 
 
+# ---- tiled surface engine ----
+#
+def _grad_(A, k, cs):
+    """dz/dx and dz/dy of the 3x3 neighbourhoods of `A` for the kernel `k`
+    using shifted slices rather than a strided window.  Returns arrays of
+    shape (rows-2, cols-2), the same as `filter_a` on `stride(A)`.
+    """
+    r, c = A.shape
+    dx = np.zeros((r - 2, c - 2))
+    dy = np.zeros((r - 2, c - 2))
+    for i in range(3):
+        for j in range(3):
+            s = A[i:r - 2 + i, j:c - 2 + j]
+            if j == 2 and k[i, 2] != 0:
+                dx += k[i, 2] * s
+            elif j == 0 and k[i, 0] != 0:
+                dx -= k[i, 0] * s
+            if i == 2 and k[2, j] != 0:
+                dy += k[2, j] * s
+            elif i == 0 and k[0, j] != 0:
+                dy -= k[0, j] * s
+    dx /= cs * 8.0
+    dy /= cs * 8.0
+    return dx, dy
+
+
+def _aspect_(dx, dy, cell_size, flat, degrees):
+    """Aspect from the gradients, as in `aspect_a`"""
+    asp = np.rad2deg(np.arctan2(dy, -dx))
+    asp = np.mod((450.0 - asp), 360.)
+    s = np.sqrt((dx*cell_size)**2 + (dy*cell_size)**2)
+    asp[s <= flat] = -1
+    if not degrees:
+        asp = np.deg2rad(asp)
+    return asp
+
+
+def _surface_band_(A, outputs, cell_size, kern, degrees, flat,
+                   sun_azim, sun_elev):
+    """Surface derivatives for one band of rows, `A`, with its 1 cell halo.
+    """
+    res = {}
+    if 'slope' in outputs or 'hillshade' in outputs:
+        dx, dy = _grad_(A, kern, cell_size)
+        sl = np.sqrt(dx**2 + dy**2)
+        del dx, dy
+    if 'aspect' in outputs or 'hillshade' in outputs:
+        # aspect_a weights the window by f_dxyz twice, ie. by its square
+        ax, ay = _grad_(A, surface_kernel**2, 1)
+    if 'slope' in outputs:  # as slope_a, rise/run if not degrees
+        res['slope'] = np.rad2deg(np.arctan(sl)) if degrees else sl
+    if 'aspect' in outputs:
+        res['aspect'] = _aspect_(ax, ay, cell_size, flat, degrees)
+    if 'hillshade' in outputs:
+        if not np.array_equal(kern, surface_kernel):  # hillshade_a default
+            dx, dy = _grad_(A, surface_kernel, cell_size)
+            sl = np.sqrt(dx**2 + dy**2)
+        a_s = sl  # hillshade_a uses slope_a(..., degrees=False), rise/run
+        a_a = _aspect_(ax, ay, 1, 0.1, False)
+        s_azi = np.deg2rad(sun_azim)
+        s_elev = np.deg2rad(90.0 - sun_elev)
+        hs = 255*((np.cos(s_elev) * np.cos(a_s)) +
+                  (np.sin(s_elev) * np.sin(a_s) * np.cos(s_azi - a_a)))
+        hs[hs < 0] = 0
+        res['hillshade'] = hs.astype('int')
+    return res
+
+
+def surface_tiles(a, outputs=('slope', 'aspect', 'hillshade'), cell_size=1,
+                  kern=None, degrees=True, flat=0.1, sun_azim=315,
+                  sun_elev=45, tile=None, workers=None, out=None):
+    """Slope, aspect and hillshade in one pass over a DEM, by row bands.
+
+    Parameters
+    ----------
+    a : array
+        2D array or np.memmap of elevations.
+    outputs : text or tuple
+        Any of `slope`, `aspect`, `hillshade`.
+    cell_size, kern, degrees, flat, sun_azim, sun_elev :
+        As in `slope_a`, `aspect_a` and `hillshade_a`.  `degrees` applies to
+        slope and aspect.
+    tile : integer
+        Output rows per band.  Each band is read with a 1 cell halo.  None
+        uses about 2**18 cells per band.
+    workers : integer
+        Threads used to process the bands.  None, uses os.cpu_count().
+    out : dict
+        Optional arrays (np.memmap for example), keyed by output name, with
+        shape (rows-2, cols-2).
+
+    Returns
+    -------
+    A dictionary of the outputs, each (rows-2, cols-2), the `valid` part of
+    the 3x3 neighbourhoods as returned by slope_a etc.
+
+    Notes
+    -----
+    The gradients come from shifted slices of the band, so no
+    (rows, cols, 3, 3) window is ever formed.  NumPy releases the GIL in the
+    arithmetic, so the bands run in parallel on the thread pool.
+    """
+    if isinstance(outputs, str):
+        outputs = (outputs,)
+    bad = [i for i in outputs if i not in ('slope', 'aspect', 'hillshade')]
+    if bad:
+        raise ValueError("Unknown outputs {}".format(bad))
+    kern = surface_kernel if kern is None else kernels(kern)
+    dts = {'slope': 'float64', 'aspect': 'float64', 'hillshade': 'int'}
+    args = (outputs, cell_size, kern, degrees, flat, sun_azim, sun_elev)
+    return _run_bands_(a, _surface_band_, args, outputs,
+                       {k: ((), dts[k]) for k in outputs}, tile, workers, out)
+
+
+def _run_bands_(a, band_func, args, outputs, specs, tile=None, workers=None,
+                out=None):
+    """Run `band_func(A, *args)` over the row bands of `a` and write the
+    results into `out`.
+
+    Each band, `A`, has a 1 cell halo and the results are the (rows-2,
+    cols-2) valid part.  `specs` gives the leading shape and dtype of each
+    output, ie. {'hillshade': ((3,), 'uint8')} for 3 sun azimuths.  The bands
+    are processed on a thread pool of `workers`.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import os
+    #
+    if a.ndim != 2 or min(a.shape) < 3:
+        raise ValueError("A 2D array, at least 3x3, is required")
+    R, C = a.shape[0] - 2, a.shape[1] - 2
+    if tile is None:
+        tile = max(1, 2**18 // max(C, 1))
+    out = {} if out is None else dict(out)
+    for k in outputs:
+        if k not in out:
+            shp, dt = specs[k]
+            out[k] = np.empty(shp + (R, C), dtype=dt)
+    #
+    def _run_(r0):
+        r1 = min(r0 + tile, R)
+        A = np.asarray(a[r0:r1 + 2], dtype=np.float64)
+        res = band_func(A, *args)
+        for k in outputs:
+            out[k][..., r0:r1, :] = res[k]
+    #
+    starts = range(0, R, tile)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(starts) == 1:
+        for r0 in starts:
+            _run_(r0)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            list(ex.map(_run_, starts))
+    return {k: out[k] for k in outputs}
+
+
+def _terrain_band_(A, outputs, cs, azims, sun_elev, flat, degrees):
+    """All `terrain` derivatives for one band of rows with a 1 cell halo.
+
+    The nine neighbours, z[i][j], are views into `A`.  Z1 to Z9 of the
+    curvature notes are z[0][0], z[0][1] ... z[2][2].
+    """
+    r, c = A.shape
+    z = [[A[i:r - 2 + i, j:c - 2 + j] for j in range(3)] for i in range(3)]
+    z5 = z[1][1]
+    res = {}
+    dx, dy = _grad_(A, surface_kernel, cs)
+    if {'slope', 'hillshade'} & set(outputs):
+        sl = np.arctan(np.sqrt(dx**2 + dy**2))
+        if 'slope' in outputs:
+            res['slope'] = np.rad2deg(sl) if degrees else sl
+    if {'aspect', 'hillshade'} & set(outputs):
+        asp = np.mod(450.0 - np.rad2deg(np.arctan2(dy, -dx)), 360.)
+        if 'aspect' in outputs:
+            a_ = asp.copy()
+            a_[np.rad2deg(np.arctan(np.sqrt(dx**2 + dy**2))) <= flat] = -1
+            res['aspect'] = a_ if degrees else np.deg2rad(a_)
+    if 'hillshade' in outputs:
+        zen = np.deg2rad(90.0 - sun_elev)
+        asp = np.deg2rad(asp)
+        t0, t1 = np.cos(zen) * np.cos(sl), np.sin(zen) * np.sin(sl)
+        hs = np.empty((len(azims),) + z5.shape, dtype=np.uint8)
+        for i, az in enumerate(azims):
+            h = 255.0 * (t0 + t1 * np.cos(np.deg2rad(az) - asp))
+            hs[i] = np.clip(h, 0, 255)
+        res['hillshade'] = hs
+    if {'profile', 'plan', 'curvature'} & set(outputs):
+        L2 = cs * cs
+        D = ((z[1][0] + z[1][2]) / 2. - z5) / L2
+        E = ((z[0][1] + z[2][1]) / 2. - z5) / L2
+        if 'curvature' in outputs:
+            res['curvature'] = -2. * (D + E) * 100.
+        if {'profile', 'plan'} & set(outputs):
+            F = (-z[0][0] + z[0][2] + z[2][0] - z[2][2]) / (4. * L2)
+            G = (-z[1][0] + z[1][2]) / (2. * cs)
+            H = (z[0][1] - z[2][1]) / (2. * cs)
+            G2, H2 = G * G, H * H
+            den = G2 + H2
+            den[den == 0] = np.inf  # flat, curvatures of 0
+            if 'profile' in outputs:
+                res['profile'] = 2. * (D*G2 + E*H2 + F*G*H) / den
+            if 'plan' in outputs:
+                res['plan'] = -2. * (D*H2 + E*G2 - F*G*H) / den
+    if {'tri', 'tpi'} & set(outputs):
+        ssq = np.zeros(z5.shape)
+        tot = np.zeros(z5.shape)
+        for i in range(3):
+            for j in range(3):
+                if i == 1 and j == 1:
+                    continue
+                d = z[i][j] - z5
+                ssq += d * d
+                tot += z[i][j]
+        if 'tri' in outputs:
+            res['tri'] = np.sqrt(ssq)
+        if 'tpi' in outputs:
+            res['tpi'] = z5 - tot / 8.
+    return res
+
+
+def terrain(a, cell_size=1, outputs=('slope', 'aspect', 'hillshade'),
+            sun_azim=315, sun_elev=45, flat=0.1, degrees=True, tile=None,
+            workers=None, out=None):
+    """Terrain derivatives from one pass over a DEM.
+
+    Parameters
+    ----------
+    a : array
+        2D array or np.memmap of elevations.
+    cell_size : number
+        Cell size, in the units of the elevations.
+    outputs : text or list
+        Any of the following.  `terrain_outputs` lists them all.
+
+        - slope : degrees, or radians if `degrees` is False
+        - aspect : azimuth from north, -1 where the slope is <= `flat`
+          degrees
+        - hillshade : uint8, (n, rows-2, cols-2) for n `sun_azim` values
+        - profile, plan : profile and planform curvature, after the
+          polynomial surface in the notes above
+        - curvature : -2(D + E) * 100
+        - tri : terrain ruggedness index, sqrt(sum((Zi - Z5)**2))
+        - tpi : topographic position index, Z5 - mean(Zi), 8 neighbours
+    sun_azim : number or list
+        One or more sun azimuths for the hillshade, ie. [315, 45, 135, 225].
+    sun_elev : number
+        Sun elevation in degrees.
+    tile, workers, out :
+        See `surface_tiles`.  `out` arrays have shape (rows-2, cols-2) or
+        (n, rows-2, cols-2) for the hillshade.
+
+    Returns
+    -------
+    A dictionary of the requested arrays, each (rows-2, cols-2).
+
+    Notes
+    -----
+    The Horn gradients are computed once per band and the nine neighbours
+    are shared views, so every output comes from the same pass.  Unlike
+    `aspect_a` and `hillshade_a`, the aspect uses the same f_dxyz gradients
+    as the slope, and the hillshade the slope angle in radians.
+    """
+    if isinstance(outputs, str):
+        outputs = (outputs,)
+    bad = [i for i in outputs if i not in terrain_outputs]
+    if bad:
+        raise ValueError("Unknown outputs {}".format(bad))
+    azims = np.atleast_1d(sun_azim).tolist()
+    specs = {k: ((), 'float64') for k in outputs}
+    specs['hillshade'] = ((len(azims),), 'uint8')
+    args = (outputs, cell_size, azims, sun_elev, flat, degrees)
+    res = _run_bands_(a, _terrain_band_, args, outputs, specs, tile,
+                      workers, out)
+    if 'hillshade' in res and np.isscalar(sun_azim):
+        res['hillshade'] = res['hillshade'][0]
+    return res
+
+
 # @time_deco
-def slope_a(a, cell_size=1, kern=None, degrees=True, verb=False, keep=False):
+def slope_a(a, cell_size=1, kern=None, degrees=True, verb=False, keep=False,
+            tile=None, workers=None, out=None):
+    """Return slope in degrees for an input array using 3rd order
+    finite difference method for a 3x3 moing window view into the array.
+
+    Requires:
+    ---------
+    - a : an input 2d array. X and Y represent coordinates of the Z values
+    - cell_size : cell size, must be in the same units as X and Y
+    - kern : kernel to use
+    - degrees : True, returns degrees otherwise radians
+    - verb : True, to print results
+    - keep : False, to remove/squeeze extra dimensions
+    - filter :
+        np.array([[1, 2, 1], [2, 0, 2], [1, 2, 1]]) **current default
+    - tile, workers, out : see `surface_tiles`
+
+    Notes:
+    ------
+
+    ::
+
+        dzdx: sum(col2 - col0)/8*cellsize
+        dzdy: sum(row2 - row0)/8*celsize
+        Assert the array is ndim=4 even if (1,z,y,x)
+        general         dzdx      +    dzdy     =    dxyz
+        [[a, b, c],  [[1, 0, 1],   [[1, 2, 1]       [[1, 2, 1]
+         [d, e, f]    [2, 0, 2], +  [0, 0, 0]   =    [2, 0, 2],
+         [g, h, i]    [1, 0, 1]]    [1, 2, 1]]       [1, 2, 1]]
+
+    """
+    if np.ndim(a) != 2:
+        return _slope_strided_(a, cell_size, kern, degrees, verb, keep)
+    frmt = """\n    :----------------------------------------:
+    :{}\n    :input array...\n    {}\n    :slope values...\n    {!r:}
+    :----------------------------------------:
+    """
+    out = None if out is None else {'slope': out}
+    s = surface_tiles(a, 'slope', cell_size, kern=kern, degrees=degrees,
+                      tile=tile, workers=workers, out=out)['slope']
+    if not keep:
+        s = np.squeeze(s)
+    if verb:
+        p = "    "
+        args = ["Results for slope_a... ",
+                indent(str(a), p), indent(str(s), p)]
+        print(dedent(frmt).format(*args))
+    return s
+
+
+def aspect_a(a, cell_size=1, flat=0.1, degrees=True, keepdims=False,
+             tile=None, workers=None, out=None):
+    """Return the aspect of a slope in degrees from North.
+
+    Requires:
+    --------
+    - a :
+        an input 2d array. X and Y represent coordinates of the Z values
+    - cell_size :
+        needed to proper flat calculation
+    - flat :
+        degree value, e.g. flat surface <= 0.05 deg
+
+        0.05 deg => 8.7e-04 rad   0.10 deg => 1.7e-02 rad
+    - tile, workers, out : see `surface_tiles`
+    """
+    if not isinstance(flat, (int, float)):
+        flat = 0.1
+    if np.ndim(a) != 2:
+        return _aspect_strided_(a, cell_size, flat, degrees, keepdims)
+    out = None if out is None else {'aspect': out}
+    asp = surface_tiles(a, 'aspect', cell_size, flat=flat, degrees=degrees,
+                        tile=tile, workers=workers, out=out)['aspect']
+    if not keepdims:
+        asp = np.squeeze(asp)
+    return asp
+
+
+def _slope_strided_(a, cell_size=1, kern=None, degrees=True, verb=False,
+                    keep=False):
     """Return slope in degrees for an input array using 3rd order
     finite difference method for a 3x3 moing window view into the array.
+    The strided version of `slope_a`, used for other than 2D arrays and by
+    `_bench_surface`.
 
     Requires:
     ---------
@@ -469,8 +833,9 @@ def slope_a(a, cell_size=1, kern=None, degrees=True, verb=False, keep=False):
     return s
 
 
-def aspect_a(a, cell_size=1, flat=0.1, degrees=True, keepdims=False):
-    """Return the aspect of a slope in degrees from North.
+def _aspect_strided_(a, cell_size=1, flat=0.1, degrees=True, keepdims=False):
+    """Return the aspect of a slope in degrees from North.  The strided
+    version of `aspect_a`.
 
     Requires:
     --------
@@ -536,7 +901,8 @@ def a2z(vals):
     return out
 
 
-def hillshade_a(a, cell_size=1, sun_azim=315, sun_elev=45):
+def hillshade_a(a, cell_size=1, sun_azim=315, sun_elev=45, tile=None,
+                workers=None, out=None):
     """Hillshade calculation as outlined in Burrough and implemented by
     : esri in ArcMap and ArcGIS Pro.  All measures in radians.
 
@@ -546,15 +912,22 @@ def hillshade_a(a, cell_size=1, sun_azim=315, sun_elev=45):
         surface properties, slope and aspect
     - hillshade:
         255.0 * ((cos(z) * cos(sl)) + (sin(z) * sin(sl) * cos(az-asp)))
+    - tile, workers, out : see `surface_tiles`
     """
-    s_azi = np.deg2rad(sun_azim)
-    s_elev = np.deg2rad(90.0 - sun_elev)
-    a_a = aspect_a(a, degrees=False)
-    a_s = slope_a(a, cell_size=cell_size, degrees=False)
-    out = 255*((np.cos(s_elev) * np.cos(a_s)) +
-               (np.sin(s_elev) * np.sin(a_s) * np.cos(s_azi - a_a)))
-    out = np.where(out < 0, 0, out)
-    return out.astype('int')
+    if np.ndim(a) != 2:
+        s_azi = np.deg2rad(sun_azim)
+        s_elev = np.deg2rad(90.0 - sun_elev)
+        a_a = aspect_a(a, degrees=False)
+        a_s = slope_a(a, cell_size=cell_size, degrees=False)
+        out = 255*((np.cos(s_elev) * np.cos(a_s)) +
+                   (np.sin(s_elev) * np.sin(a_s) * np.cos(s_azi - a_a)))
+        out = np.where(out < 0, 0, out)
+        return out.astype('int')
+    out = None if out is None else {'hillshade': out}
+    hs = surface_tiles(a, 'hillshade', cell_size, sun_azim=sun_azim,
+                       sun_elev=sun_elev, tile=tile, workers=workers,
+                       out=out)['hillshade']
+    return np.squeeze(hs)
 
 
 # ---- Demo section ----------------------------------------------------------
@@ -716,6 +1089,45 @@ def circ_demo(rmax=50, plot=False):
     return cs
 
 
+def _bench_surface(sizes=(2000, 10000), workers=None, strided_max=4000):
+    """Time `surface_tiles` (slope, aspect and hillshade in one pass)
+    against the strided slope_a, aspect_a and hillshade_a calls.  The DEM is
+    a 1025x1025 diamond-square surface mirrored out to `size`.  The strided
+    versions need about 9 times the DEM in memory, so they are skipped above
+    `strided_max`.
+    """
+    import time
+    import contextlib
+    import io
+    from arraytools.rasters.diamond_square import d_s
+    with contextlib.redirect_stdout(io.StringIO()):  # d_s prints its steps
+        base = d_s(10, low=0, high=500, r=0.2)
+    base = np.c_[base, np.fliplr(base)]
+    base = np.r_[base, np.flipud(base)]
+    frmt = "{:>6} x {:<6} strided {:>8} s  tiled {:8.3f} s  max diff {}"
+    for n in sizes:
+        reps = n // base.shape[0] + 1
+        a = np.tile(base, (reps, reps))[:n, :n]
+        t0 = time.perf_counter()
+        r = surface_tiles(a, workers=workers)
+        t1 = time.perf_counter() - t0
+        t_s, diff = '-', '-'
+        if n <= strided_max:
+            t0 = time.perf_counter()
+            sl = _slope_strided_(a)
+            asp = _aspect_strided_(a)
+            s_azi, s_elev = np.deg2rad(315), np.deg2rad(45.)  # hillshade_a
+            a_a = _aspect_strided_(a, degrees=False)
+            a_s = _slope_strided_(a, degrees=False)
+            hs = 255*((np.cos(s_elev) * np.cos(a_s)) +
+                      (np.sin(s_elev) * np.sin(a_s) * np.cos(s_azi - a_a)))
+            hs = np.where(hs < 0, 0, hs).astype('int')
+            t_s = "{:8.3f}".format(time.perf_counter() - t0)
+            diff = max(np.abs(sl - r['slope']).max(),
+                       np.abs(asp - r['aspect']).max())
+        print(frmt.format(n, n, t_s, t1, diff))
+
+
 def single_demo():
     """Some finite single slope examples.
     :
@@ -8,12 +8,13 @@ Script :   tbl.py   tools for working with text arrays in table form
 
 Author :   Dan.Patterson@carleton.ca
 
-Modified : 2019-02-11
+Modified : 2019-02-16
 
 Purpose :  Tabulate data
 
 - Unique counts on 2 or more variables.
 - Sums, mins, max etc on variable classes
+- `group_by`, any of count, sum, mean, min, max, first, last by group
 
 Requires
 --------
@@ -113,6 +114,8 @@ if 'prn' not in locals().keys():
 __all__ = ['find_a_in_b',
            'find_in',
            '_split_sort_slice_',
+           'group_by',
+           'group_names',
            'tbl_count',
            'tbl_sum']
 
@@ -362,9 +365,194 @@ def _split_sort_slice_(a, split_fld=None, order_fld=None):
     return ordered
 
 
+# ---- group by kernel ----
+#
+group_names = ('count', 'sum', 'mean', 'min', 'max', 'first', 'last')
+
+
+def _factorize_(cols):
+    """Factorize the key columns of a table into group numbers.
+
+    Parameters
+    ----------
+    cols : list of arrays
+        The key columns, each shape (N,).
+
+    Returns
+    -------
+    uniqs : list of arrays
+        The sorted unique values of each column.
+    codes : list of arrays
+        For each column, the index into `uniqs` of each group's key.
+    inv : array
+        The group number of each row, shape (N,).
+    cnt : array
+        The rows in each group.
+
+    Notes
+    -----
+    Each column is factorized once with `np.unique(..., return_inverse=True)`
+    and the codes are combined as mixed radix keys, so the groups are in the
+    order np.unique returns for the records.  When the number of possible
+    keys is no more than the rows (or 2**16), the groups are found with
+    `np.bincount`, otherwise with a `np.unique` of the int64 keys.
+    """
+    uniqs, invs = [], []
+    for c in cols:
+        u, i = np.unique(np.asarray(c).ravel(), return_inverse=True)
+        uniqs.append(u)
+        invs.append(i.ravel())
+    sizes = [max(len(u), 1) for u in uniqs]
+    if np.prod(sizes, dtype=np.float64) >= 2.0**62:
+        dt = [('f{}'.format(j), np.intp) for j in range(len(invs))]
+        rec = np.empty(len(invs[0]), dtype=dt)
+        for j, i in enumerate(invs):
+            rec['f{}'.format(j)] = i
+        keys, inv, cnt = np.unique(rec, return_inverse=True,
+                                   return_counts=True)
+        codes = [keys['f{}'.format(j)] for j in range(len(invs))]
+        return uniqs, codes, inv.ravel(), cnt
+    key = invs[0].astype(np.int64)
+    for i, n in zip(invs[1:], sizes[1:]):
+        key *= n
+        key += i
+    total = int(np.prod(sizes, dtype=np.int64))
+    if total <= max(len(key), 2**16):
+        cnt = np.bincount(key, minlength=total)
+        keys = np.flatnonzero(cnt)
+        lut = np.zeros(total, dtype=np.intp)
+        lut[keys] = np.arange(len(keys))
+        inv = lut[key]
+        cnt = cnt[keys]
+    else:
+        keys, inv, cnt = np.unique(key, return_inverse=True,
+                                   return_counts=True)
+        inv = inv.ravel()
+    codes = []
+    for n in sizes[::-1]:
+        codes.append(keys % n)
+        keys = keys // n
+    return uniqs, codes[::-1], inv, cnt
+
+
+def _group_reduce_(v, inv, cnt, stats, order=None):
+    """Reduce the values `v` by group, given `inv` and `cnt` from
+    `_factorize_`.  Returns a dict of {stat: array} and the sort `order`,
+    which is only made when min, max, first, last or an integer sum is
+    asked for and can be passed back in for the next field.
+
+    sum and mean skip nan, as np.nansum, and a group of nan has a nan mean.
+    min and max skip nan.  first and last are in row order.
+    """
+    n = len(cnt)
+    out = {}
+    if 'count' in stats:
+        out['count'] = cnt
+    is_flt = v.dtype.kind in 'fc'
+    by_order = [s for s in ('min', 'max', 'first', 'last') if s in stats]
+    if 'sum' in stats and not is_flt:
+        by_order.append('sum')
+    if by_order:
+        if order is None:
+            order = np.argsort(inv, kind='stable')
+        vs = v[order]
+        ends = np.cumsum(cnt)
+        starts = ends - cnt
+        if 'first' in stats:
+            out['first'] = vs[starts]
+        if 'last' in stats:
+            out['last'] = vs[ends - 1]
+        if 'min' in stats:
+            f = np.fmin if is_flt else np.minimum
+            out['min'] = f.reduceat(vs, starts) if n else vs[:0]
+        if 'max' in stats:
+            f = np.fmax if is_flt else np.maximum
+            out['max'] = f.reduceat(vs, starts) if n else vs[:0]
+        if 'sum' in by_order:
+            t = vs.astype(np.int64) if v.dtype.kind in 'ib' else vs
+            out['sum'] = np.add.reduceat(t, starts) if n else t[:0]
+    if is_flt and ('sum' in stats or 'mean' in stats):
+        good = ~np.isnan(v)
+        w = np.where(good, v, 0) if not good.all() else v
+        s = np.bincount(inv, weights=w, minlength=n)
+        if 'sum' in stats:
+            out['sum'] = s
+        if 'mean' in stats:
+            k = np.bincount(inv, weights=good, minlength=n)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out['mean'] = s / k
+    elif 'mean' in stats:
+        s = np.bincount(inv, weights=v, minlength=n)
+        out['mean'] = s / np.maximum(cnt, 1)
+    return out, order
+
+
+def group_by(a, keys, vals=None, stats=('count', 'sum')):
+    """Summarize the fields `vals` of `a` for each unique combination of the
+    `keys` fields.
+
+    Parameters
+    ----------
+    a : structured/recarray
+        The table, shape (N,).
+    keys : text or list of text
+        The field(s) defining the groups.
+    vals : text or list of text
+        The numeric field(s) to summarize.  None, for `count` only.
+    stats : text or list of text
+        Any of `group_names`, count, sum, mean, min, max, first, last.
+
+    Returns
+    -------
+    A structured array with the key fields, `Count` if asked for, then
+    `<val>_<stat>` for each value field and statistic, one record per group
+    sorted by the keys.
+
+    Notes
+    -----
+    The keys are factorized once by `_factorize_` and every statistic is a
+    `np.bincount` or `ufunc.reduceat` over the group numbers, so the time is
+    a few sorts of the table, whatever the number of groups.
+
+    >>> group_by(a, ['County', 'Town'], 'Age', ('count', 'mean', 'max'))
+    """
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    vals = [] if vals is None else vals
+    vals = [vals] if isinstance(vals, str) else list(vals)
+    stats = [stats] if isinstance(stats, str) else list(stats)
+    names = a.dtype.names
+    missing = [f for f in keys + vals if f not in names]
+    if missing:
+        raise ValueError("Fields not in array: {}".format(missing))
+    bad = [s for s in stats if s not in group_names]
+    if bad:
+        raise ValueError("stats {} not in {}".format(bad, group_names))
+    if [f for f in vals if a[f].dtype.kind not in 'biuf']:
+        raise ValueError("The value fields must be numeric")
+    uniqs, codes, inv, cnt = _factorize_([a[k] for k in keys])
+    dt = [(k, a.dtype[k]) for k in keys]
+    res = []
+    if 'count' in stats:
+        dt.append(('Count', '<i8'))
+        res.append(cnt)
+    order = None
+    v_stats = [s for s in stats if s != 'count']
+    for f in vals:
+        r, order = _group_reduce_(a[f], inv, cnt, v_stats, order)
+        for s in v_stats:
+            dt.append(('{}_{}'.format(f, s), r[s].dtype))
+            res.append(r[s])
+    z = np.empty(len(cnt), dtype=dt)
+    for k, u, c in zip(keys, uniqs, codes):
+        z[k] = u[c]
+    for name, r in zip(z.dtype.names[len(keys):], res):
+        z[name] = r
+    return z
+
+
 def tbl_count(a, row=None, col=None, verbose=False):
-    """Crosstabulate 2 fields data arrays, shape (N,), using np.unique.
-    scipy.sparse has similar functionality and is faster for large arrays.
+    """Crosstabulate 2 fields data arrays, shape (N,), using `_factorize_`,
+    the group by kernel also used by `group_by`.
 
     Parameters
     ----------
@@ -383,23 +571,16 @@ def tbl_count(a, row=None, col=None, verbose=False):
     -------
     ctab : array
         the crosstabulation result as row, col, count array
-    a : array
-        the crosstabulation in a row, col, count, but filled out whether a
-        particular combination exists or not.
-    r, c : names
-        unique values/names for the row and column variables
     """
     names = a.dtype.names
     assert row in names, "The.. {} ..column, not found in array.".format(row)
     assert col in names, "The.. {} ..column, not found in array.".format(col)
-    r_vals = a[row]
-    c_vals = a[col]
-    dt = np.dtype([(row, r_vals.dtype), (col, c_vals.dtype)])
-    rc = np.asarray(list(zip(r_vals, c_vals)), dtype=dt)
-    u, cnt = np.unique(rc, return_counts=True)
-    rcc_dt = u.dtype.descr
-    rcc_dt.append(('Count', '<i4'))
-    ctab = np.asarray(list(zip(u[row], u[col], cnt)), dtype=rcc_dt)
+    uniqs, codes, _, cnt = _factorize_([a[row], a[col]])
+    rcc_dt = [(row, a[row].dtype), (col, a[col].dtype), ('Count', '<i4')]
+    ctab = np.empty(len(cnt), dtype=rcc_dt)
+    ctab[row] = uniqs[0][codes[0]]
+    ctab[col] = uniqs[1][codes[1]]
+    ctab['Count'] = cnt
     if verbose:
         prn(ctab)
     else:
@@ -412,19 +593,22 @@ def tbl_sum(a, row=None, col=None, val_fld=None):
     Parameters
     ----------
     a : array
-        Structured/recarray
+        Structured/recarray, or a `colstore.Table`, of which only the three
+        fields are read
     row, col : string
         The fields to be used as the table rows and columns
     val_fld : string
         The field that will be summed for the unique combinations of
-        row/column classes
+        row/column classes.  nan values are skipped.
 
     Returns
     -------
     A table summarizing the sums for the row/column combinations.
+
+    See Also
+    --------
+    `group_by` for other statistics and more than two key fields.
     """
-    # ---- Slice the input array using the row/column fields, determine the
-    # unique combinations of their attributes.  Create the output dtype
     names = a.dtype.names
     assert row in names, "The.. {} ..column, not found in array.".format(row)
     assert col in names, "The.. {} ..column, not found in array.".format(col)
@@ -436,24 +620,72 @@ def tbl_sum(a, row=None, col=None, val_fld=None):
         val_type = '<f8'
     elif val_kind == 'i':
         val_type = '<i4'
+    sum_name = val_fld + '_sum'
+    uniqs, codes, inv, cnt = _factorize_([a[row], a[col]])
+    r, _ = _group_reduce_(a[val_fld], inv, cnt, ['sum'])
+    dt = [(row, a[row].dtype), (col, a[col].dtype), (sum_name, val_type)]
+    z = np.empty(len(cnt), dtype=dt)
+    z[row] = uniqs[0][codes[0]]
+    z[col] = uniqs[1][codes[1]]
+    z[sum_name] = r['sum']
+    return z
+
+
+def _tbl_count_zip_(a, row, col):
+    """The former `tbl_count`, records built with zip, kept for `_bench_group`
+    """
+    dt = np.dtype([(row, a[row].dtype), (col, a[col].dtype)])
+    rc = np.asarray(list(zip(a[row], a[col])), dtype=dt)
+    u, cnt = np.unique(rc, return_counts=True)
+    rcc_dt = u.dtype.descr
+    rcc_dt.append(('Count', '<i4'))
+    return np.asarray(list(zip(u[row], u[col], cnt)), dtype=rcc_dt)
+
+
+def _tbl_sum_loop_(a, row, col, val_fld):
+    """The former `tbl_sum`, a mask per group, kept for `_bench_group`
+    """
     rc = a[[row, col]]
-    sum_name = val_fld +'_sum'
-    dt = rc.dtype.descr + [(sum_name, val_type)]
     uniq = np.unique(rc)
-    #
-    # ----
     out_ = []
     for u in uniq:
         c0, c1 = u
         idx = np.logical_and(a[row] == c0, a[col] == c1)
-        val = np.nansum(a[val_fld][idx])
-        out_.append([c0, c1, val])
-    out_ = np.array(out_)
-    z = np.empty((len(out_),), dtype=dt)
-    z[row] = out_[:, 0]
-    z[col] = out_[:, 1]
-    z[sum_name] = out_[:, 2].astype(val_kind)
-    return z
+        out_.append(np.nansum(a[val_fld][idx]))
+    return uniq, np.array(out_)
+
+
+def _bench_group(N=(10**4, 10**5, 10**6, 10**7), groups=(20, 50)):
+    """Time `tbl_count`, `tbl_sum` and `group_by` against the loop versions,
+    for text row keys and integer column keys.
+    """
+    from time import perf_counter
+    frmt = "{:>12,} rows {:>5} groups  {:<9} {:>8.3f} s  old {}"
+    rng = np.random.RandomState(1)
+    towns = np.array(['T{:03d}'.format(i) for i in range(groups[0])])
+    for n in N:
+        a = np.empty(n, dtype=[('Town', '<U4'), ('Zone', '<i4'),
+                               ('Val', '<f8')])
+        a['Town'] = towns[rng.randint(0, groups[0], n)]
+        a['Zone'] = rng.randint(0, groups[1], n)
+        a['Val'] = rng.rand(n)
+        ng = groups[0] * groups[1]
+        for name, f, g in [
+                ('tbl_count', lambda: tbl_count(a, 'Town', 'Zone'),
+                 lambda: _tbl_count_zip_(a, 'Town', 'Zone')),
+                ('tbl_sum', lambda: tbl_sum(a, 'Town', 'Zone', 'Val'),
+                 lambda: _tbl_sum_loop_(a, 'Town', 'Zone', 'Val')),
+                ('group_by', lambda: group_by(a, ['Town', 'Zone'], 'Val',
+                                              group_names), None)]:
+            t0 = perf_counter()
+            f()
+            t1 = perf_counter() - t0
+            old = '-'
+            if g is not None and n <= 10**5:
+                t0 = perf_counter()
+                g()
+                old = "{:8.3f} s".format(perf_counter() - t0)
+            print(frmt.format(n, ng, name, t1, old))
 
 
 # ---- crosstab from tool, uncomment for testing or tool use
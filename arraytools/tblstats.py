@@ -245,7 +245,8 @@ def col_stats(a, fields=None, deci=2):
     Parameters:
     -----------
     a : array
-        A structured/recarray
+        A structured/recarray, or a `colstore.Table`, of which only the
+        numeric fields used are read
     fields : list, string or None
       - None,  checks all fields or assumes that the input array is a singleton
       - string, a single field name, if the column names are known
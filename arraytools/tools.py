@@ -255,6 +255,9 @@ masked_array(data =
 rolling_stats() : function 
     Stats for a strided array including min, max, mean, sum, std, var, ptp
 
+focal_stats(a, win=(3, 3), stats=('mean',), nodata=None) : function
+    Moving window stats from integral images, any window size
+
 find : function
     Locate items in an array
 
@@ -365,7 +368,7 @@ __all__ = ['arr2xyz', 'make_blocks',     # (1-6) ndarrays ... make arrays,
            'change_arr', 'concat_arrs',  # (15-16) change/modify arrays
            'pad_', 'stride', 'block',    # (17-22) stride, block and pad
            'sliding_window_view',
-           'block_arr', 'rolling_stats',
+           'block_arr', 'rolling_stats', 'focal_stats',
            '_func', 'find', 'find_closest',  # (23-28) querying, analysis
            'group_pnts',
            'uniq', 'is_in',
@@ -557,7 +560,127 @@ def group_vals(seq, delta=0, oper='!='):
     return s
 
 
-def reclass(a, bins=None, new_bins=None):  #, mask_=False, mask_val=None):
+# ---- reclass engine .... lookup tables, one pass, tiled ----
+def _tiled_map_(a, func, dtype, out=None, tile=None):
+    """Apply `func` to bands of `tile` rows of `a`, or the whole array,
+    writing to `out`.  `out` may be `a` itself for an in-place reclass, or
+    a np.memmap.
+    """
+    if out is None:
+        out = np.empty(a.shape, dtype=dtype)
+    if tile is None or a.ndim < 2:
+        out[...] = func(np.asarray(a))
+        return out
+    for r0 in range(0, a.shape[0], tile):
+        out[r0:r0 + tile] = func(np.asarray(a[r0:r0 + tile]))
+    return out
+
+
+def _reclass_vals_(a, old_vals, new_vals, nodata=None, out=None, tile=None):
+    """Replace `old_vals` by `new_vals` in one pass, leaving other values and
+    `nodata` (a number or a list) as they are.
+
+    Integer rasters use a lookup table, `lut[a]`, over the whole dtype for
+    8 and 16 bit types, or over the span of `old_vals` for others.  A span
+    over 2**24 values, or a float raster, uses np.searchsorted on the sorted
+    old values.  If an old value is repeated, its last new value is used.
+    For integer rasters, old values must be whole numbers and new values
+    must fit the dtype.
+    """
+    old = np.asarray(old_vals).ravel()
+    new = np.asarray(new_vals).ravel()
+    if nodata is not None:
+        keep = ~np.isin(old, np.atleast_1d(nodata))
+        old, new = old[keep], new[keep]
+    if a.dtype.kind in 'iu' and old.size:
+        if old.dtype.kind not in 'biu' and (old != np.round(old)).any():
+            raise ValueError("old_vals must be integers for an integer raster")
+        info = np.iinfo(a.dtype)
+        if (new < info.min).any() or (new > info.max).any():
+            raise ValueError("new_vals out of range for {}".format(a.dtype))
+    new = new.astype(a.dtype)
+    old, idx = np.unique(old[::-1], return_index=True)  # last of duplicates
+    new = new[::-1][idx]
+    if old.size == 0:
+        return _tiled_map_(a, lambda A: A, a.dtype, out, tile)
+    if a.dtype.kind in 'iu' and a.dtype.itemsize <= 2:
+        info = np.iinfo(a.dtype)
+        ok = (old >= info.min) & (old <= info.max)
+        old, new = old[ok], new[ok]
+        lo = info.min
+        lut = np.arange(lo, info.max + 1).astype(a.dtype)
+        lut[old.astype(np.int64) - lo] = new
+
+        def func(A):
+            return lut[A.astype(np.int64) - lo] if lo else lut[A]
+    elif a.dtype.kind in 'iu' and old[-1] - old[0] < 2**24:
+        lo, hi = int(old[0]), int(old[-1])
+        lut = np.arange(lo, hi + 1).astype(a.dtype)
+        lut[old.astype(np.int64) - lo] = new
+
+        def func(A):
+            i = A.astype(np.int64)
+            i -= lo
+            inside = (i >= 0) & (i <= hi - lo)
+            np.clip(i, 0, hi - lo, out=i)
+            return np.where(inside, lut[i], A)
+    else:
+        def func(A):
+            i = np.searchsorted(old, A)
+            np.minimum(i, old.size - 1, out=i)
+            hit = old[i] == A
+            r = A.copy()
+            r[hit] = new[i[hit]]
+            return r
+    return _tiled_map_(a, func, a.dtype, out, tile)
+
+
+def _reclass_bins_(a, bins, new_bins, nodata=None, out=None, tile=None):
+    """Reclass values in the ranges [bins[i], bins[i+1]) to new_bins[i] in
+    one pass.  Values outside of the bins become 0 and `nodata` (a number
+    or a list) is kept.  The bins are located by np.searchsorted, or a
+    lookup table of them for 8 and 16 bit integer rasters.
+
+    The result has the dtype of `a` if the new classes fit it, ie. whole
+    numbers within its range for integer rasters, otherwise the
+    `np.result_type` of the two.
+    """
+    bins = np.asarray(bins).ravel()
+    new_bins = np.asarray(new_bins).ravel()[:bins.size - 1]
+    dt = a.dtype
+    if dt.kind in 'iu' and new_bins.size:
+        info = np.iinfo(dt)
+        fits = (new_bins >= info.min).all() and (new_bins <= info.max).all()
+        if new_bins.dtype.kind not in 'biu':
+            fits = fits and (new_bins == np.round(new_bins)).all()
+        if not fits:
+            dt = np.result_type(dt, new_bins.dtype)
+    table = np.zeros(bins.size + 1, dtype=dt)
+    table[1:new_bins.size + 1] = new_bins
+    nd = None if nodata is None else np.atleast_1d(nodata)
+    if a.dtype.kind in 'iu' and a.dtype.itemsize <= 2:
+        info = np.iinfo(a.dtype)
+        vals = np.arange(info.min, info.max + 1)
+        lut = table[np.searchsorted(bins, vals, side='right')]
+        if nd is not None:
+            m = np.isin(vals, nd)
+            lut[m] = vals[m]
+        lo = info.min
+
+        def func(A):
+            return lut[A.astype(np.int64) - lo] if lo else lut[A]
+        return _tiled_map_(a, func, dt, out, tile)
+
+    def func(A):
+        r = table[np.searchsorted(bins, A, side='right')]
+        if nd is not None:
+            m = np.isin(A, nd)
+            r[m] = A[m]
+        return r
+    return _tiled_map_(a, func, dt, out, tile)
+
+
+def reclass(a, bins=None, new_bins=None, nodata=None, out=None, tile=None):
     """Reclass an array of integer or floating point values.
 
     Parameters
@@ -567,11 +690,12 @@ def reclass(a, bins=None, new_bins=None):  #, mask_=False, mask_val=None):
         include one value higher to cover the upper range.
     new_bins : list/tuple
         new class values for each bin
-    mask : boolean **deferred**
-        whether the raster contains nodata values or values to
-        be masked with mask_val
-    mask_val: number **deferred**
-        value to be masked
+    nodata : number or list
+        values kept as they are, rather than reclassed
+    out : array
+        optional output array, ie. a np.memmap or `a` for in place
+    tile : integer
+        rows per band for memmaps, see `_reclass_bins_`
 
     Array dimensions will be squeezed.
 
@@ -580,7 +704,7 @@ def reclass(a, bins=None, new_bins=None):  #, mask_=False, mask_val=None):
     >>> z = np.arange(3*5).reshape(3,5)
     >>> bins = [0, 5, 10, 15]
     >>> new_bins = [1, 2, 3, 4]
-    >>> z_recl = reclass(z, bins, new_bins, mask=False, mask_val=None)
+    >>> z_recl = reclass(z, bins, new_bins)
 
     outputs::
 
@@ -590,7 +714,6 @@ def reclass(a, bins=None, new_bins=None):  #, mask_=False, mask_val=None):
                [10, 11, 12, 13, 14]])         [3, 3, 3, 3, 3]])
 
     """
-    a_rc = np.zeros_like(a)
     c_0 = isinstance(bins, (list, tuple))
     c_1 = isinstance(new_bins, (list, tuple))
     err = "Bins = {} new = {} won't work".format(bins, new_bins)
@@ -602,12 +725,7 @@ def reclass(a, bins=None, new_bins=None):  #, mask_=False, mask_val=None):
         return a
     if len(new_bins) < 2:
         new_bins = np.arange(1, len(bins)+2)
-    new_classes = list(zip(bins[:-1], bins[1:], new_bins))
-    for rc in new_classes:
-        q1 = (a >= rc[0])
-        q2 = (a < rc[1])
-        a_rc = a_rc + np.where(q1 & q2, rc[2], 0)
-    return a_rc
+    return _reclass_bins_(a, bins, new_bins, nodata, out, tile)
 
 
 def scale(a, x=2, y=2, num_z=None):
@@ -677,24 +795,27 @@ def split_array(a, fld='ID', ordered=False):
 
     Parameters
     ----------
-    `a` : A structured or recarray.
+    `a` : A structured or recarray, or a `colstore.Table`, whose `fld`
+    column is read first and then the rows of each group.
 
-    `fld` : A numeric field assumed to be sorted which indicates which group
-    a record belongs to.
+    `fld` : A field which indicates which group a record belongs to.  If
+    `ordered`, the groups are the runs of equal values, otherwise the
+    groups are in sorted order of their values, records in input order.
 
     Returns
     -------
     A list of arrays split on the categorizing field
 
     """
+    keys = np.asarray(a[fld])
     if ordered:
-        return np.split(a, np.where(np.diff(a[fld]))[0] + 1)
-    out = []
-    uni, idx = np.unique(a[fld], True)
-    for _, j in enumerate(uni):
-        key = (a[fld] == j)
-        out.append(a[key])
-    return out
+        cuts = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+        bounds = zip(np.r_[0, cuts], np.r_[cuts, len(keys)])
+        return [a[i:j] for i, j in bounds]
+    order = np.argsort(keys, kind='stable')
+    k = keys[order]
+    cuts = np.flatnonzero(k[1:] != k[:-1]) + 1
+    return np.split(a[order], cuts)
 
 
 # ----------------------------------------------------------------------
@@ -1331,6 +1452,203 @@ def rolling_stats(a, no_null=True, prn=True):
         return a_min, a_max, a_mean, a_med, a_sum, a_std, a_var, a_ptp
 
 
+# ---- focal statistics .... integral images and van Herk/Gil-Werman ----
+focal_names = ['count', 'sum', 'mean', 'var', 'std', 'min', 'max', 'range']
+
+
+def _box_sum_(A, win):
+    """Window sums of `A` from its integral image, the valid part only.
+    """
+    wr, wc = win
+    S = np.zeros((A.shape[0] + 1, A.shape[1] + 1))
+    np.cumsum(A, axis=0, out=S[1:, 1:])
+    np.cumsum(S[1:, 1:], axis=1, out=S[1:, 1:])
+    return S[wr:, wc:] - S[:-wr, wc:] - S[wr:, :-wc] + S[:-wr, :-wc]
+
+
+def _vhgw_(A, w, func, axis):
+    """Moving `func` (np.minimum or np.maximum) of width `w` along `axis`,
+    after van Herk and Gil-Werman.  Two running accumulations within blocks
+    of `w` values give each window from 2 lookups, whatever `w` is.
+    """
+    A = np.moveaxis(A, axis, -1)
+    n = A.shape[-1]
+    nb = -(-n // w)
+    fill = -np.inf if func is np.maximum else np.inf
+    P = np.full(A.shape[:-1] + (nb * w,), fill)
+    P[..., :n] = A
+    B = P.reshape(A.shape[:-1] + (nb, w))
+    g = func.accumulate(B, axis=-1).reshape(P.shape)
+    h = func.accumulate(B[..., ::-1], axis=-1)[..., ::-1].reshape(P.shape)
+    return np.moveaxis(func(h[..., :n - w + 1], g[..., w - 1:n]), -1, axis)
+
+
+def _focal_band_(A, win, stats, nodata, min_count):
+    """`focal_stats` for one band of rows, `A`, including the window halo.
+    """
+    bad = np.isnan(A)
+    if nodata is not None:
+        bad |= A == nodata
+    cnt = None
+    if bad.any():
+        cnt = np.rint(_box_sum_((~bad).astype(np.float64), win))
+    elif {'count', 'sum', 'mean', 'var', 'std'} & set(stats):
+        shp = (A.shape[0] - win[0] + 1, A.shape[1] - win[1] + 1)
+        cnt = np.full(shp, float(win[0] * win[1]))
+    res = {}
+    if {'sum', 'mean', 'var', 'std'} & set(stats):
+        sh = np.mean(A[~bad]) if (~bad).any() else 0.  # shift for precision
+        D = np.where(bad, 0., A - sh)
+        s1 = _box_sum_(D, win)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mn = s1 / cnt
+            if 'sum' in stats:
+                res['sum'] = s1 + sh * cnt
+            if 'mean' in stats:
+                res['mean'] = mn + sh
+            if {'var', 'std'} & set(stats):
+                var = _box_sum_(D * D, win) / cnt - mn * mn
+                np.maximum(var, 0, out=var)
+                if 'var' in stats:
+                    res['var'] = var
+                if 'std' in stats:
+                    res['std'] = np.sqrt(var)
+    if {'min', 'max', 'range'} & set(stats):
+        for nm, func, fill in (('min', np.minimum, np.inf),
+                               ('max', np.maximum, -np.inf)):
+            if nm in stats or 'range' in stats:
+                v = np.where(bad, fill, A)
+                v = _vhgw_(_vhgw_(v, win[1], func, 1), win[0], func, 0)
+                res[nm] = v
+        if 'range' in stats:
+            res['range'] = res['max'] - res['min']
+    if 'count' in stats:
+        res['count'] = cnt
+    if cnt is not None:
+        few = cnt < max(min_count, 1)
+        if few.any():
+            for k in res:
+                if k not in ('count', 'sum'):
+                    res[k][few] = np.nan
+    return res
+
+
+def focal_stats(a, win=(3, 3), stats=('mean',), nodata=None, min_count=1,
+                tile=None, out=None):
+    """Moving window statistics whose cost does not depend on the window
+    size.
+
+    Parameters
+    ----------
+    a : array
+        2D array or np.memmap.  np.nan and `nodata` cells are ignored.
+    win : integer or tuple
+        Window (rows, cols).  An integer gives a square window.
+    stats : text or list
+        From `focal_names`, ie. count, sum, mean, var, std, min, max, range.
+        `var` and `std` are population values (ddof=0).
+    min_count : integer
+        Cells whose window has fewer valid values are np.nan.  The sum of
+        an empty window is 0.
+    tile : integer
+        Output rows per band, the input band adds `win[0] - 1` rows.
+    out : dictionary
+        Optional arrays, ie. np.memmaps, keyed by stat.
+
+    Returns
+    -------
+    A dictionary of (rows - win[0] + 1, cols - win[1] + 1) float arrays, the
+    shape of `stride(a, win)` without the window axes.  Use `pad_` first to
+    keep the input shape.
+
+    Notes
+    -----
+    The sum, mean, var and std come from integral images, cumulative sums
+    of the values and their squares, less the band mean for precision.  Each
+    window is then 4 lookups.  The min and max use van Herk/Gil-Werman
+    passes along the rows then the columns, 3 comparisons per cell.  No
+    (rows, cols, win, win) view is reduced, as in `rolling_stats`.
+
+    >>> a = np.arange(36.).reshape(6, 6)
+    >>> focal_stats(a, 3, ['mean', 'range'])['range']
+    array([[ 14.00,  14.00,  14.00,  14.00], ... 4 rows
+    >>> focal_stats(a, 3, 'sum')['sum']
+    array([[ 63.00,  72.00,  81.00,  90.00], ... 4 rows
+    """
+    if isinstance(stats, str):
+        stats = (stats,)
+    bad = [i for i in stats if i not in focal_names]
+    if bad:
+        raise ValueError("Unknown stats {}".format(bad))
+    if np.ndim(win) == 0:
+        win = (win, win)
+    wr, wc = [int(i) for i in win]
+    win = (wr, wc)
+    err = "A 2D array, larger than the window, is required"
+    if a.ndim != 2:
+        raise ValueError(err)
+    R, C = a.shape[0] - wr + 1, a.shape[1] - wc + 1
+    if R < 1 or C < 1:
+        raise ValueError(err)
+    if tile is None:
+        tile = max(wr, 2**20 // max(a.shape[1], 1))
+    out = {} if out is None else dict(out)
+    for k in stats:
+        if k not in out:
+            out[k] = np.empty((R, C), dtype=np.float64)
+    for r0 in range(0, R, tile):
+        r1 = min(r0 + tile, R)
+        A = np.asarray(a[r0:r1 + wr - 1], dtype=np.float64)
+        res = _focal_band_(A, win, stats, nodata, min_count)
+        for k in stats:
+            out[k][r0:r1] = res[k]
+    return {k: out[k] for k in stats}
+
+
+def _bench_focal(shape=(2000, 2000), wins=(3, 5, 11, 25, 51, 101),
+                 strided_max=11):
+    """Time `focal_stats` for mean, std and max against reducing a
+    `stride` view, for square windows.  Then sum and max without nan.
+    """
+    import time
+    a = np.random.default_rng(2).random(shape)
+    c = a.copy()
+    a[a > 0.99] = np.nan
+    print("{} array, 1% nan".format(shape))
+    for w in wins:
+        t0 = time.perf_counter()
+        r = focal_stats(a, w, ['mean', 'std', 'max'])
+        t1 = time.perf_counter()
+        msg = "win {:>3}  focal_stats {:6.3f} s".format(w, t1 - t0)
+        if w <= strided_max:
+            s = stride(a, (w, w))
+            t1 = time.perf_counter()
+            m = np.nanmean(s, axis=(2, 3))
+            sd = np.nanstd(s, axis=(2, 3))
+            mx = np.nanmax(s, axis=(2, 3))
+            t2 = time.perf_counter()
+            d = max(np.nanmax(np.abs(r['mean'] - m)),
+                    np.nanmax(np.abs(r['std'] - sd)),
+                    np.nanmax(np.abs(r['max'] - mx)))
+            msg += "  stride {:7.3f} s  max diff {:.1e}".format(t2 - t1, d)
+        print(msg)
+    print("{} array, no nan, sum and max".format(shape))
+    for w in wins:
+        t0 = time.perf_counter()
+        r = focal_stats(c, w, ['sum', 'max'])
+        t1 = time.perf_counter()
+        msg = "win {:>3}  focal_stats {:6.3f} s".format(w, t1 - t0)
+        if w <= strided_max:
+            s = stride(c, (w, w))
+            t1 = time.perf_counter()
+            sm = s.sum(axis=(2, 3))
+            mx = s.max(axis=(2, 3))
+            t2 = time.perf_counter()
+            d = max(np.abs(r['sum'] - sm).max(), np.abs(r['max'] - mx).max())
+            msg += "  stride {:7.3f} s  max diff {:.1e}".format(t2 - t1, d)
+        print(msg)
+
+
 # ----------------------------------------------------------------------
 # ---- (5) querying, working with arrays ----
 # ----------------------------------------------------------------------
@@ -1345,9 +1663,9 @@ def _func(fn, a, this):
     if fn in ['cumsum', 'csum', 'cu']:
         v = np.where(np.cumsum(a) <= this)[0]
     elif fn in ['eq', 'e', '==']:
-        v = np.where(np.in1d(a, this))[0]
+        v = np.where(np.isin(a, this))[0]
     elif fn in ['neq', 'ne', '!=']:
-        v = np.where(~np.in1d(a, this))[0]  # (a, this, invert=True)
+        v = np.where(~np.isin(a, this))[0]  # (a, this, invert=True)
     elif fn in ['ls', 'les', '<']:
         v = np.where(a < this)[0]
     elif fn in ['lseq', 'lese', '<=']: